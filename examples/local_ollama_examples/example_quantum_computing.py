@@ -2,16 +2,100 @@
 
 This example demonstrates using local Ollama models to research
 quantum computing error correction techniques and their practical applications.
+
+The model is loaded and pinned in memory before research starts, so phase
+transitions never wait on a reload. To keep it resident for every client, start
+the server with OLLAMA_KEEP_ALIVE=-1.
 """
 import asyncio
+import logging
 import os
+import queue
+import sys
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+
+import aiohttp
 from open_deep_research.deep_researcher import deep_researcher
+from langchain_community.cache import SQLiteCache
+from langchain_core.globals import set_llm_cache
 from langchain_core.messages import HumanMessage
 
+# Local cache of LLM responses keyed by (prompt, model parameters); re-running
+# the same research replays identical Ollama calls from disk instead of the model.
+# Set ODR_LLM_CACHE="" to disable.
+LLM_CACHE_PATH = os.environ.get("ODR_LLM_CACHE", ".langchain_llm_cache.db")
+
+# Ollama batches concurrent requests server-side across OLLAMA_NUM_PARALLEL slots,
+# so run as many research units at once as the server can decode together.
+OLLAMA_NUM_PARALLEL = int(os.environ.get("OLLAMA_NUM_PARALLEL", "4"))
+
+logger = logging.getLogger(__name__)
+
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434")
+SEARXNG_URL = "http://localhost:8080"
+# llama3.2:latest is the 4-bit Q4_K_M build of the 3B model. For correctness-
+# sensitive report writing, ODR_FINAL_REPORT_MODEL can select a higher precision
+# tag such as llama3.2:3b-instruct-q8_0 at roughly half the decode speed.
+MODEL_TAG = os.environ.get("ODR_MODEL", "llama3.2:latest")
+FINAL_REPORT_MODEL_TAG = os.environ.get("ODR_FINAL_REPORT_MODEL", MODEL_TAG)
+
+OUTPUT_DIR = "examples/local_ollama_examples/reports"
+PREVIEW_CHARS = 150
+NEWLINE = b"\n"
+
+# Invariant parts of the report header, encoded once at import
+REPORT_HEADER_PREFIX = b"# Quantum Error Correction Research Report\n\n**Generated:** "
+REPORT_HEADER_QUERY = b"\n\n**Query:** "
+REPORT_HEADER_SUFFIX = b"\n\n---\n\n"
+
+
+_KNOWN_DIRS: set[str] = set()
+
+
+def ensure_dir(path: str) -> None:
+    """Create a directory once per process, skipping the filesystem on repeat calls."""
+    if path in _KNOWN_DIRS:
+        return
+    os.makedirs(path, exist_ok=True)
+    _KNOWN_DIRS.add(path)
+
+
+async def warm_up_ollama(session: aiohttp.ClientSession, model: str) -> None:
+    """Load a model into memory and keep it there for the rest of the run."""
+    # An empty prompt only loads the weights; keep_alive=-1 disables unloading
+    async with session.post(
+        f"{OLLAMA_URL}/api/generate",
+        json={"model": model, "prompt": "", "keep_alive": -1},
+        timeout=aiohttp.ClientTimeout(total=120.0),
+    ) as response:
+        response.raise_for_status()
+
 
-async def run_quantum_research():
-    """Run quantum computing error correction research."""
+async def warm_up_searxng(session: aiohttp.ClientSession) -> None:
+    """Open a pooled connection to SearXNG that the search tool then reuses."""
+    async with session.head(f"{SEARXNG_URL}/", timeout=aiohttp.ClientTimeout(total=2.0)):
+        pass
+
+
+def write_report(filename: str, *chunks: bytes) -> None:
+    """Write encoded report chunks straight to a file descriptor."""
+    fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        for chunk in chunks:
+            view = memoryview(chunk)
+            while view:
+                view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+
+async def run_quantum_research(verbose: bool = False):
+    """Run quantum computing error correction research.
+
+    Args:
+        verbose: Stream and print every node's output; otherwise only await the final state
+    """
 
     query = """What are the most promising quantum error correction techniques
     currently being developed, and how do they compare in terms of practical
@@ -22,92 +106,142 @@ async def run_quantum_research():
     print("="*70)
     print(f"\nQuery: {query}")
     print("\nConfiguration:")
-    print("   - LLM: Ollama (llama3.2:latest)")
-    print("   - Search: SearXNG (localhost:8080)")
+    print(f"   - LLM: Ollama ({MODEL_TAG})")
+    print(f"   - Search: SearXNG ({SEARXNG_URL})")
     print("   - Database: PostgreSQL (localhost:5432)")
     print("\n" + "="*70 + "\n")
 
     # Configure for local Ollama research
     config = {
         "configurable": {
-            "summarization_model": "ollama:llama3.2:latest",
-            "research_model": "ollama:llama3.2:latest",
-            "compression_model": "ollama:llama3.2:latest",
-            "final_report_model": "ollama:llama3.2:latest",
+            "summarization_model": f"ollama:{MODEL_TAG}",
+            "research_model": f"ollama:{MODEL_TAG}",
+            "compression_model": f"ollama:{MODEL_TAG}",
+            "final_report_model": f"ollama:{FINAL_REPORT_MODEL_TAG}",
             "search_api": "searxng",
-            "searxng_url": "http://localhost:8080",
-            "max_concurrent_research_units": 2,
+            "searxng_url": SEARXNG_URL,
+            "max_concurrent_research_units": OLLAMA_NUM_PARALLEL,
             "allow_clarification": False,
+            # Deduplicate repeated SearXNG queries across research units
+            "tool_cache": {},
         }
     }
 
     inputs = {"messages": [HumanMessage(content=query)]}
 
+    # One keep-alive pool for the warm-up and every SearXNG request in the run
+    http_session = aiohttp.ClientSession()
+    config["configurable"]["http_session"] = http_session
+
+    # Ensure output directory exists before research starts, off the save path
+    ensure_dir(OUTPUT_DIR)
+
+    # Serve repeated summarization/research/compression prompts from the cache
+    if LLM_CACHE_PATH:
+        set_llm_cache(SQLiteCache(database_path=LLM_CACHE_PATH))
+
+    # Emit progress from a background thread so terminal writes never block the event loop
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    listener = QueueListener(log_queue, logging.StreamHandler(sys.stdout))
+    logger.addHandler(queue_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    listener.start()
+
     try:
-        print("[START] Starting research...\n")
+        # Load the models and connect to SearXNG concurrently so neither cold
+        # start lands on the first research unit
+        models = list(dict.fromkeys([MODEL_TAG, FINAL_REPORT_MODEL_TAG]))
+        warmups = await asyncio.gather(
+            *(warm_up_ollama(http_session, model) for model in models),
+            warm_up_searxng(http_session),
+            return_exceptions=True,
+        )
+        for target, result in zip([*models, "SearXNG"], warmups):
+            if isinstance(result, Exception):
+                logger.warning(f"[WARNING] Warm-up failed for {target}: {result}")
+
+        logger.info("[START] Starting research...\n")
         final_state = None
 
-        async for event in deep_researcher.astream(inputs, config=config):
-            for node_name, node_output in event.items():
-                print(f"[NODE] {node_name}")
-                if node_output and isinstance(node_output, dict) and "messages" in node_output:
-                    for msg in node_output["messages"]:
-                        if hasattr(msg, "content"):
-                            content_preview = msg.content[:150].replace("\n", " ")
-                            # Handle Unicode characters for Windows console
-                            try:
-                                print(f"   {content_preview}...")
-                            except UnicodeEncodeError:
-                                safe_preview = content_preview.encode('ascii', errors='replace').decode('ascii')
-                                print(f"   {safe_preview}...")
-                print()
-                final_state = node_output
-
-        print("="*70)
-        print("[SUCCESS] Research completed successfully!")
+        if not verbose:
+            # Nothing to show per node, so skip the streaming machinery entirely
+            final_state = await deep_researcher.ainvoke(inputs, config=config)
+        else:
+            # Message previews only help an interactive reader
+            show_previews = sys.stdout.isatty()
+
+            async for event in deep_researcher.astream(inputs, config=config):
+                for node_name, node_output in event.items():
+                    logger.info(f"[NODE] {node_name}")
+                    if show_previews and node_output and isinstance(node_output, dict) and "messages" in node_output:
+                        for msg in node_output["messages"]:
+                            if hasattr(msg, "content"):
+                                content = msg.content
+                                if len(content) > PREVIEW_CHARS:
+                                    content = content[:PREVIEW_CHARS]
+                                content_preview = content.replace("\n", " ")
+                                logger.info(f"   {content_preview}...")
+                    logger.info("")
+                    final_state = node_output
+
+        logger.info("="*70)
+        logger.info("[SUCCESS] Research completed successfully!")
 
         # Save final report
         if final_state and isinstance(final_state, dict):
             final_report = final_state.get("final_report")
             if final_report:
-                # Ensure output directory exists
-                output_dir = "examples/local_ollama_examples/reports"
-                os.makedirs(output_dir, exist_ok=True)
-
-                # Generate filename with timestamp
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"{output_dir}/quantum_error_correction_{timestamp}.md"
-
-                # Save report
-                with open(filename, "w", encoding="utf-8") as f:
-                    f.write(f"# Quantum Error Correction Research Report\n\n")
-                    f.write(f"**Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-                    f.write(f"**Query:** {query}\n\n")
-                    f.write("---\n\n")
-                    f.write(final_report)
-
-                print(f"\n[SAVED] Research report saved to: {filename}")
-                print(f"[SIZE] Report length: {len(final_report)} characters")
-                print(f"[LINES] Report lines: {final_report.count(chr(10)) + 1}")
+                # Generate filename and header timestamps from a single clock read
+                now = datetime.now()
+                timestamp = now.strftime("%Y%m%d_%H%M%S")
+                filename = f"{OUTPUT_DIR}/quantum_error_correction_{timestamp}.md"
+
+                # Encode the report once; the bytes serve both the write and the stats
+                header = b"".join([
+                    REPORT_HEADER_PREFIX,
+                    now.strftime("%Y-%m-%d %H:%M:%S").encode(),
+                    REPORT_HEADER_QUERY,
+                    query.encode("utf-8"),
+                    REPORT_HEADER_SUFFIX,
+                ])
+                report_bytes = final_report.encode("utf-8")
+                write_report(filename, header, report_bytes)
+
+                logger.info(f"\n[SAVED] Research report saved to: {filename}")
+                logger.info(f"[SIZE] Report size: {len(report_bytes)} bytes")
+                logger.info(f"[LINES] Report lines: {report_bytes.count(NEWLINE) + 1}")
             else:
-                print("\n[WARNING] No final_report found in final state")
+                logger.warning("\n[WARNING] No final_report found in final state")
 
         return final_state
 
     except Exception as e:
-        print(f"\n[ERROR] Research failed: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"\n[ERROR] Research failed: {e}")
         return None
 
+    finally:
+        # Drain queued records before returning to the caller
+        listener.stop()
+        logger.removeHandler(queue_handler)
+        await http_session.close()
+
 
 if __name__ == "__main__":
+    # Encode output as UTF-8 once instead of handling errors per message; on
+    # legacy Windows consoles also set PYTHONIOENCODING=utf-8
+    sys.stdout.reconfigure(encoding="utf-8", errors="replace")
+
     print("\n" + "="*70)
     print("LOCAL OLLAMA RESEARCH EXAMPLE: QUANTUM COMPUTING")
     print("="*70)
 
     # Run the research
-    result = asyncio.run(run_quantum_research())
+    # Stream node progress interactively unless ODR_VERBOSE=0
+    result = asyncio.run(run_quantum_research(
+        verbose=os.environ.get("ODR_VERBOSE", "1") == "1"
+    ))
 
     if result:
         print("\n" + "="*70)
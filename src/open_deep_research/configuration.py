@@ -75,6 +75,19 @@ class Configuration(BaseModel):
             }
         }
     )
+    max_concurrent_summaries: int = Field(
+        default=10,
+        metadata={
+            "x_oap_ui_config": {
+                "type": "slider",
+                "default": 10,
+                "min": 1,
+                "max": 50,
+                "step": 1,
+                "description": "Maximum number of webpage summarizations to run concurrently within a single search call. Lower this if your summarization model provider rate limits you."
+            }
+        }
+    )
     # Research Configuration
     search_api: SearchAPI = Field(
         default=SearchAPI.TAVILY,
@@ -41,6 +41,7 @@ from open_deep_research.state import (
 )
 from open_deep_research.utils import (
     anthropic_websearch_called,
+    build_tool_runners,
     execute_tool,
     get_all_tools,
     get_api_key_for_model,
@@ -621,7 +622,8 @@ async def researcher_tools(state: ResearcherState, config: RunnableConfig) -> Co
         return Command(goto="compress_research")
 
     # Step 2: Execute tool calls
-    tools = await get_all_tools(config)
+    # Build the dispatch table once for every tool call in this step
+    tool_runners = build_tool_runners(await get_all_tools(config))
     tool_outputs = []
 
     for tool_call in tool_calls_to_process:
@@ -630,7 +632,7 @@ async def researcher_tools(state: ResearcherState, config: RunnableConfig) -> Co
 
         # Execute the tool using our helper from utils
         try:
-            observation = await execute_tool(tools, tool_name, tool_args)
+            observation = await execute_tool(tool_runners, tool_name, tool_args)
         except Exception as e:
             observation = f"Error executing {tool_name}: {str(e)}"
 
@@ -1,12 +1,27 @@
 """Utility functions and helpers for the Deep Research agent."""
 
 import asyncio
+import functools
+import hashlib
 import json
 import logging
 import os
-import warnings
+import re
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
-from typing import Annotated, Any, Dict, List, Literal, Optional, Type, TypeVar
+from typing import (
+    Annotated,
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Literal,
+    Optional,
+    Type,
+    TypeVar,
+)
 
 import aiohttp
 from langchain.chat_models import init_chat_model
@@ -36,12 +51,47 @@ from open_deep_research.configuration import Configuration, SearchAPI
 from open_deep_research.prompts import summarize_webpage_prompt
 from open_deep_research.state import ResearchComplete, Summary
 
+try:
+    import orjson
+except ImportError:  # orjson is optional
+    orjson = None
+
 T = TypeVar('T', bound=BaseModel)
 
+
+def _json_loads(data: str | bytes) -> Any:
+    """Parse JSON with orjson when installed, else with json.
+
+    orjson rejects some input json accepts (e.g. NaN), so that input is
+    retried with json. Failures raise json.JSONDecodeError either way.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
 ##########################
 # Structured Output Compatibility Utils
 ##########################
 
+# Models that support structured output
+_STRUCTURED_OUTPUT_SUPPORTED = (
+    'openai:',
+    'anthropic:',
+    'google:',
+    'gemini:',
+)
+
+# Ollama and other local models don't support structured output
+_STRUCTURED_OUTPUT_UNSUPPORTED = (
+    'ollama:',
+    'together:',
+    'groq:',  # Groq may support it, but being conservative
+)
+
+@functools.lru_cache(maxsize=128)
 def supports_structured_output(model_name: str) -> bool:
     """Check if a model supports LangChain's with_structured_output() method.
 
@@ -53,33 +103,10 @@ def supports_structured_output(model_name: str) -> bool:
     """
     model_str = str(model_name).lower()
 
-    # Models that support structured output
-    supported_providers = [
-        'openai:',
-        'anthropic:',
-        'google:',
-        'gemini:',
-    ]
-
-    # Ollama and other local models don't support structured output
-    unsupported_providers = [
-        'ollama:',
-        'together:',
-        'groq:',  # Groq may support it, but being conservative
-    ]
-
-    # Check if it's an unsupported provider
-    for provider in unsupported_providers:
-        if model_str.startswith(provider):
-            return False
-
-    # Check if it's a supported provider
-    for provider in supported_providers:
-        if model_str.startswith(provider):
-            return True
-
-    # Default to False for unknown providers
-    return False
+    # Unsupported providers take precedence; unknown providers default to False
+    if model_str.startswith(_STRUCTURED_OUTPUT_UNSUPPORTED):
+        return False
+    return model_str.startswith(_STRUCTURED_OUTPUT_SUPPORTED)
 
 def get_model_with_structured_output(
     model: BaseChatModel,
@@ -112,12 +139,49 @@ def get_model_with_structured_output(
         # Return the base model - we'll handle JSON parsing manually
         return model.with_retry(stop_after_attempt=max_retries)
 
+# Contents of the first markdown code block, with or without a json language tag
+_CODE_BLOCK_RE = re.compile(r"```(?:json)?\s*(.*?)\s*```", re.DOTALL)
+
+# Internal schemas whose fields are all plain strings, safe to build with model_construct
+_TRUSTED_CONSTRUCT_SCHEMAS = frozenset({Summary})
+
+@functools.lru_cache(maxsize=64)
+def _json_instruction_for(schema: Type[BaseModel]) -> str:
+    """Render the JSON-mode instruction for a schema once and reuse it.
+
+    Args:
+        schema: Pydantic model class for the expected output structure
+
+    Returns:
+        Instruction text to append to the prompt of models without structured output
+    """
+    schema_dict = schema.model_json_schema()
+
+    # Create a clearer example of what we expect
+    field_descriptions = []
+    for field_name, field_info in schema_dict.get('properties', {}).items():
+        field_desc = field_info.get('description', '')
+        field_type = field_info.get('type', 'string')
+        field_descriptions.append(f'  "{field_name}": <{field_type}> - {field_desc}')
+
+    return f"""
+
+IMPORTANT: You must respond with a valid JSON object (NOT the schema itself).
+
+Required JSON format:
+{{
+{chr(10).join(field_descriptions)}
+}}
+
+Respond ONLY with a JSON object containing actual values for these fields. Do NOT return the schema definition itself."""
+
 async def get_structured_output_from_model(
     model: BaseChatModel,
     model_name: str,
     messages: List[MessageLikeRepresentation],
     schema: Type[T],
-    schema_name: str = "output"
+    schema_name: str = "output",
+    uses_json_mode: Optional[bool] = None
 ) -> T:
     """Get structured output from a model with automatic fallback to JSON parsing.
 
@@ -130,6 +194,7 @@ async def get_structured_output_from_model(
         messages: List of messages to send to the model
         schema: Pydantic model class for validation
         schema_name: Name to use in JSON schema description
+        uses_json_mode: Whether the model needs JSON mode; derived from model_name when None
 
     Returns:
         Validated instance of the schema type
@@ -137,76 +202,164 @@ async def get_structured_output_from_model(
     Raises:
         ValidationError: If the model's output doesn't match the schema
     """
-    if supports_structured_output(model_name):
-        # Model supports structured output directly
-        response = await model.ainvoke(messages)
-        return response
-    else:
-        # Use JSON mode for Ollama and similar models
-        # Add JSON schema instruction to the last message
-        schema_dict = schema.model_json_schema()
+    if uses_json_mode is None:
+        uses_json_mode = not supports_structured_output(model_name)
 
-        # Create a clearer example of what we expect
-        field_descriptions = []
-        for field_name, field_info in schema_dict.get('properties', {}).items():
-            field_desc = field_info.get('description', '')
-            field_type = field_info.get('type', 'string')
-            field_descriptions.append(f'  "{field_name}": <{field_type}> - {field_desc}')
+    if uses_json_mode:
+        return await _get_json_mode_output(model, model_name, messages, schema)
+    return await _get_native_structured_output(model, messages)
 
-        json_instruction = f"""
+async def _get_native_structured_output(
+    model: BaseChatModel,
+    messages: List[MessageLikeRepresentation]
+) -> Any:
+    """Invoke a model already configured with with_structured_output()."""
+    return await model.ainvoke(messages)
 
-IMPORTANT: You must respond with a valid JSON object (NOT the schema itself).
+async def _get_json_mode_output(
+    model: BaseChatModel,
+    model_name: str,
+    messages: List[MessageLikeRepresentation],
+    schema: Type[T]
+) -> T:
+    """Instruct a model without structured output support to answer in JSON and parse it."""
+    # Add JSON schema instruction to the last message
+    json_instruction = _json_instruction_for(schema)
+
+    # Build a new list only around the last message, leaving the caller's list untouched
+    if not messages:
+        modified_messages = messages
+    elif isinstance(messages[-1], HumanMessage):
+        modified_messages = [
+            *messages[:-1],
+            HumanMessage(content=messages[-1].content + json_instruction)
+        ]
+    else:
+        # If last message isn't human, add a new one
+        modified_messages = [*messages, HumanMessage(content=json_instruction)]
 
-Required JSON format:
-{{
-{chr(10).join(field_descriptions)}
-}}
+    # Get response from model
+    response = await model.ainvoke(modified_messages)
 
-Respond ONLY with a JSON object containing actual values for these fields. Do NOT return the schema definition itself."""
+    # Parse JSON from response
+    response_text = response.content if hasattr(response, 'content') else str(response)
 
-        # Clone messages and add instruction to last message
-        modified_messages = list(messages)
-        if modified_messages:
-            last_msg = modified_messages[-1]
-            if isinstance(last_msg, HumanMessage):
-                modified_messages[-1] = HumanMessage(
-                    content=last_msg.content + json_instruction
-                )
-            else:
-                # If last message isn't human, add a new one
-                modified_messages.append(HumanMessage(content=json_instruction))
-
-        # Get response from model
-        response = await model.ainvoke(modified_messages)
-
-        # Parse JSON from response
-        response_text = response.content if hasattr(response, 'content') else str(response)
-
-        # Try to extract JSON from markdown code blocks if present
-        if '```json' in response_text:
-            json_start = response_text.find('```json') + 7
-            json_end = response_text.find('```', json_start)
-            if json_end > json_start:
-                response_text = response_text[json_start:json_end].strip()
-        elif '```' in response_text:
-            # Generic code block
-            json_start = response_text.find('```') + 3
-            json_end = response_text.find('```', json_start)
-            if json_end > json_start:
-                response_text = response_text[json_start:json_end].strip()
-
-        # Parse and validate JSON
+    # Try to extract JSON from a markdown code block if present
+    code_block = _CODE_BLOCK_RE.search(response_text)
+    if code_block:
+        response_text = code_block.group(1)
+
+    response_text = response_text.strip()
+
+    # Flat all-string schemas skip validation when every field is already a string
+    if schema in _TRUSTED_CONSTRUCT_SCHEMAS:
         try:
-            parsed_data = json.loads(response_text.strip())
-            return schema(**parsed_data)
-        except (json.JSONDecodeError, ValidationError) as e:
-            logging.error(f"Failed to parse structured output from {model_name}: {e}")
-            logging.error(f"Response was: {response_text[:500]}")
-            raise
+            parsed_data = _json_loads(response_text)
+        except json.JSONDecodeError:
+            parsed_data = None
+        if isinstance(parsed_data, dict):
+            field_values = {name: parsed_data.get(name) for name in schema.model_fields}
+            if all(isinstance(value, str) for value in field_values.values()):
+                return schema.model_construct(**field_values)
+
+    # Parse and validate JSON in a single pass; malformed JSON also raises ValidationError
+    try:
+        return schema.model_validate_json(response_text)
+    except ValidationError as e:
+        logging.error(f"Failed to parse structured output from {model_name}: {e}")
+        logging.error(f"Response was: {response_text[:500]}")
+        raise
 
 ##########################
 # Tavily Search Tool Utils
 ##########################
+@functools.lru_cache(maxsize=8)
+def _get_summarizer(
+    model_name: str,
+    max_tokens: int,
+    api_key: Optional[str],
+    max_retries: int
+) -> BaseChatModel:
+    """Build the structured-output summarization model, reused across search calls.
+
+    Args:
+        model_name: Summarization model identifier
+        max_tokens: Maximum output tokens for the model
+        api_key: API key for the model provider, if any
+        max_retries: Number of structured output retries
+
+    Returns:
+        Summarization model configured to return a Summary
+    """
+    base_model = init_chat_model(
+        model=model_name,
+        max_tokens=max_tokens,
+        api_key=api_key,
+        tags=["langsmith:nostream"]
+    )
+
+    # Use our helper to configure structured output with Ollama support
+    return get_model_with_structured_output(base_model, model_name, Summary, max_retries)
+
+async def _summarize_search_results(
+    contents: List[Optional[str]],
+    config: RunnableConfig
+) -> List[Optional[str]]:
+    """Summarize search result contents in parallel, skipping empty entries.
+
+    Args:
+        contents: Webpage content per search result, None or empty when unavailable
+        config: Runtime configuration for API keys and model settings
+
+    Returns:
+        Summary per result, or None where there was no content to summarize
+    """
+    # Avoid setting up the summarization model when nothing needs summarizing
+    if not any(contents):
+        return [None] * len(contents)
+
+    # Set up the summarization model with configuration
+    configurable = Configuration.from_runnable_config(config)
+
+    # Character limit to stay within model token limits (configurable)
+    max_char_to_include = configurable.max_content_length
+
+    # Initialize summarization model with retry logic
+    model_api_key = get_api_key_for_model(configurable.summarization_model, config)
+    summarization_model = _get_summarizer(
+        configurable.summarization_model,
+        configurable.summarization_model_max_tokens,
+        model_api_key,
+        configurable.max_structured_output_retries
+    )
+
+    # Create summarization tasks (skip empty content)
+    async def noop():
+        """No-op function for results without content."""
+        return None
+
+    # Bound concurrent summarizations to avoid provider rate limiting
+    summary_semaphore = asyncio.Semaphore(configurable.max_concurrent_summaries)
+    uses_json_mode = not supports_structured_output(configurable.summarization_model)
+
+    async def bounded_summarize(content: str):
+        """Summarize content while holding a concurrency slot."""
+        async with summary_semaphore:
+            return await summarize_webpage(
+                summarization_model,
+                content[:max_char_to_include],
+                configurable.summarization_model,
+                uses_json_mode
+            )
+
+    summarization_tasks = [
+        bounded_summarize(content) if content else noop()
+        for content in contents
+    ]
+
+    # Execute all summarization tasks in parallel
+    return await asyncio.gather(*summarization_tasks)
+
 TAVILY_SEARCH_DESCRIPTION = (
     "A search engine optimized for comprehensive, accurate, and trusted results. "
     "Useful for when you need to answer questions about current events."
@@ -246,72 +399,37 @@ async def tavily_search(
             if url not in unique_results:
                 unique_results[url] = {**result, "query": response['query']}
     
-    # Step 3: Set up the summarization model with configuration
-    configurable = Configuration.from_runnable_config(config)
-
-    # Character limit to stay within model token limits (configurable)
-    max_char_to_include = configurable.max_content_length
-
-    # Initialize summarization model with retry logic
-    model_api_key = get_api_key_for_model(configurable.summarization_model, config)
-    base_model = init_chat_model(
-        model=configurable.summarization_model,
-        max_tokens=configurable.summarization_model_max_tokens,
-        api_key=model_api_key,
-        tags=["langsmith:nostream"]
+    # Steps 3-5: Summarize result content in parallel
+    summaries = await _summarize_search_results(
+        [result.get("raw_content") for result in unique_results.values()],
+        config
     )
 
-    # Use our helper to configure structured output with Ollama support
-    summarization_model = get_model_with_structured_output(
-        base_model,
-        configurable.summarization_model,
-        Summary,
-        configurable.max_structured_output_retries
-    )
-
-    # Step 4: Create summarization tasks (skip empty content)
-    async def noop():
-        """No-op function for results without raw content."""
-        return None
+    # Step 6: Format each result with its summary in a single pass
+    if not unique_results:
+        return "No valid search results found. Please try different search queries or use a different search API."
 
-    summarization_tasks = [
-        noop() if not result.get("raw_content")
-        else summarize_webpage(
-            summarization_model,
-            result['raw_content'][:max_char_to_include],
-            configurable.summarization_model
+    output_parts = ["Search results: \n\n"]
+    for i, ((url, result), summary) in enumerate(zip(unique_results.items(), summaries)):
+        content = result['content'] if summary is None else summary
+        output_parts.append(
+            f"\n\n--- SOURCE {i+1}: {result['title']} ---\n"
+            f"URL: {url}\n\n"
+            f"SUMMARY:\n{content}\n\n"
+            f"\n\n{'-' * 80}\n"
         )
-        for result in unique_results.values()
-    ]
-    
-    # Step 5: Execute all summarization tasks in parallel
-    summaries = await asyncio.gather(*summarization_tasks)
     
-    # Step 6: Combine results with their summaries
-    summarized_results = {
-        url: {
-            'title': result['title'], 
-            'content': result['content'] if summary is None else summary
-        }
-        for url, result, summary in zip(
-            unique_results.keys(), 
-            unique_results.values(), 
-            summaries
-        )
-    }
-    
-    # Step 7: Format the final output
-    if not summarized_results:
-        return "No valid search results found. Please try different search queries or use a different search API."
-    
-    formatted_output = "Search results: \n\n"
-    for i, (url, result) in enumerate(summarized_results.items()):
-        formatted_output += f"\n\n--- SOURCE {i+1}: {result['title']} ---\n"
-        formatted_output += f"URL: {url}\n\n"
-        formatted_output += f"SUMMARY:\n{result['content']}\n\n"
-        formatted_output += "\n\n" + "-" * 80 + "\n"
-    
-    return formatted_output
+    return "".join(output_parts)
+
+# Tavily clients reused across tool calls, keyed by API key
+_TAVILY_CLIENTS: Dict[Optional[str], AsyncTavilyClient] = {}
+
+def _get_tavily_client(api_key: Optional[str]) -> AsyncTavilyClient:
+    """Return a cached Tavily client for the given API key, creating it on first use."""
+    client = _TAVILY_CLIENTS.get(api_key)
+    if client is None:
+        client = _TAVILY_CLIENTS[api_key] = AsyncTavilyClient(api_key=api_key)
+    return client
 
 async def tavily_search_async(
     search_queries, 
@@ -332,9 +450,12 @@ async def tavily_search_async(
     Returns:
         List of search result dictionaries from Tavily API
     """
-    # Initialize the Tavily client with API key from config
-    tavily_client = AsyncTavilyClient(api_key=get_tavily_api_key(config))
+    # Reuse the Tavily client for this API key across tool invocations
+    tavily_client = _get_tavily_client(get_tavily_api_key(config))
     
+    # Send each distinct query once, preserving first-seen order
+    unique_queries = list(dict.fromkeys(search_queries))
+
     # Create search tasks for parallel execution
     search_tasks = [
         tavily_client.search(
@@ -343,17 +464,30 @@ async def tavily_search_async(
             include_raw_content=include_raw_content,
             topic=topic
         )
-        for query in search_queries
+        for query in unique_queries
     ]
     
-    # Execute all search queries in parallel and return results
-    search_results = await asyncio.gather(*search_tasks)
-    return search_results
+    # Execute all search queries in parallel and map results back to every requested query
+    results_by_query = dict(zip(unique_queries, await asyncio.gather(*search_tasks)))
+    return [results_by_query[query] for query in search_queries]
+
+# LRU cache of formatted summaries keyed by (model name, content digest)
+_SUMMARY_CACHE_MAX_ENTRIES = 2048
+_SUMMARY_CACHE: "OrderedDict[tuple[Optional[str], bytes], str]" = OrderedDict()
+
+# Summaries currently being generated, so concurrent duplicates await one model call
+_INFLIGHT_SUMMARIES: Dict[tuple[Optional[str], bytes], asyncio.Future] = {}
+
+def _summary_cache_key(model_name: Optional[str], webpage_content: str) -> tuple[Optional[str], bytes]:
+    """Build the summary cache key for a piece of webpage content."""
+    digest = hashlib.blake2b(webpage_content.encode(), digest_size=16).digest()
+    return (model_name, digest)
 
 async def summarize_webpage(
     model: BaseChatModel,
     webpage_content: str,
-    model_name: str = None
+    model_name: str = None,
+    uses_json_mode: Optional[bool] = None
 ) -> str:
     """Summarize webpage content using AI model with timeout protection.
 
@@ -361,10 +495,48 @@ async def summarize_webpage(
         model: The chat model configured for summarization
         webpage_content: Raw webpage content to be summarized
         model_name: Optional model name for determining structured output support
+        uses_json_mode: Whether the model needs JSON mode; derived from model_name when None
 
     Returns:
         Formatted summary with key excerpts, or original content if summarization fails
     """
+    # Return a previous summary of identical content without calling the model
+    cache_key = _summary_cache_key(model_name, webpage_content)
+    cached_summary = _SUMMARY_CACHE.get(cache_key)
+    if cached_summary is not None:
+        _SUMMARY_CACHE.move_to_end(cache_key)
+        return cached_summary
+
+    # Join an identical summarization that is already running instead of repeating it
+    inflight = _INFLIGHT_SUMMARIES.get(cache_key)
+    if inflight is not None:
+        return await asyncio.shield(inflight)
+
+    future = asyncio.get_running_loop().create_future()
+    _INFLIGHT_SUMMARIES[cache_key] = future
+    try:
+        formatted_summary = await _summarize_webpage_uncached(
+            model, webpage_content, model_name, uses_json_mode, cache_key
+        )
+        future.set_result(formatted_summary)
+        return formatted_summary
+    finally:
+        # If we were cancelled, waiters fall back to the raw content
+        if not future.done():
+            future.set_result(webpage_content)
+        del _INFLIGHT_SUMMARIES[cache_key]
+
+async def _summarize_webpage_uncached(
+    model: BaseChatModel,
+    webpage_content: str,
+    model_name: Optional[str],
+    uses_json_mode: Optional[bool],
+    cache_key: tuple[Optional[str], bytes]
+) -> str:
+    """Call the model to summarize webpage content and cache a successful result."""
+    if uses_json_mode is None:
+        uses_json_mode = bool(model_name) and not supports_structured_output(model_name)
+
     try:
         # Create prompt with current date context
         prompt_content = summarize_webpage_prompt.format(
@@ -373,7 +545,7 @@ async def summarize_webpage(
         )
 
         # Determine if we need to use structured output helper
-        if model_name and not supports_structured_output(model_name):
+        if uses_json_mode:
             # Use JSON mode for Ollama and similar models
             summary = await asyncio.wait_for(
                 get_structured_output_from_model(
@@ -381,7 +553,8 @@ async def summarize_webpage(
                     model_name,
                     [HumanMessage(content=prompt_content)],
                     Summary,
-                    "webpage_summary"
+                    "webpage_summary",
+                    uses_json_mode=True
                 ),
                 timeout=60.0
             )
@@ -398,6 +571,11 @@ async def summarize_webpage(
             f"<key_excerpts>\n{summary.key_excerpts}\n</key_excerpts>"
         )
 
+        # Only successful summaries are cached; failures fall back to raw content
+        _SUMMARY_CACHE[cache_key] = formatted_summary
+        if len(_SUMMARY_CACHE) > _SUMMARY_CACHE_MAX_ENTRIES:
+            _SUMMARY_CACHE.popitem(last=False)
+
         return formatted_summary
 
     except asyncio.TimeoutError:
@@ -452,72 +630,27 @@ async def searxng_search(
                     'query': response.get('query', '')
                 }
 
-    # Step 3: Set up the summarization model with configuration
-    configurable = Configuration.from_runnable_config(config)
-
-    # Character limit to stay within model token limits (configurable)
-    max_char_to_include = configurable.max_content_length
-
-    # Initialize summarization model with retry logic
-    model_api_key = get_api_key_for_model(configurable.summarization_model, config)
-    base_model = init_chat_model(
-        model=configurable.summarization_model,
-        max_tokens=configurable.summarization_model_max_tokens,
-        api_key=model_api_key,
-        tags=["langsmith:nostream"]
+    # Steps 3-5: Summarize result content in parallel
+    summaries = await _summarize_search_results(
+        [result.get("content") for result in unique_results.values()],
+        config
     )
 
-    # Use our helper to configure structured output with Ollama support
-    summarization_model = get_model_with_structured_output(
-        base_model,
-        configurable.summarization_model,
-        Summary,
-        configurable.max_structured_output_retries
-    )
-
-    # Step 4: Create summarization tasks (skip empty content)
-    async def noop():
-        """No-op function for results without content."""
-        return None
-
-    summarization_tasks = [
-        noop() if not result.get("content")
-        else summarize_webpage(
-            summarization_model,
-            result['content'][:max_char_to_include],
-            configurable.summarization_model
-        )
-        for result in unique_results.values()
-    ]
-
-    # Step 5: Execute all summarization tasks in parallel
-    summaries = await asyncio.gather(*summarization_tasks)
-
-    # Step 6: Combine results with their summaries
-    summarized_results = {
-        url: {
-            'title': result['title'],
-            'content': result['content'] if summary is None else summary
-        }
-        for url, result, summary in zip(
-            unique_results.keys(),
-            unique_results.values(),
-            summaries
-        )
-    }
-
-    # Step 7: Format the final output
-    if not summarized_results:
+    # Step 6: Format each result with its summary in a single pass
+    if not unique_results:
         return "No valid search results found. Please try different search queries or check SearXNG server status."
 
-    formatted_output = "Search results: \n\n"
-    for i, (url, result) in enumerate(summarized_results.items()):
-        formatted_output += f"\n\n--- SOURCE {i+1}: {result['title']} ---\n"
-        formatted_output += f"URL: {url}\n\n"
-        formatted_output += f"SUMMARY:\n{result['content']}\n\n"
-        formatted_output += "\n\n" + "-" * 80 + "\n"
+    output_parts = ["Search results: \n\n"]
+    for i, ((url, result), summary) in enumerate(zip(unique_results.items(), summaries)):
+        content = result['content'] if summary is None else summary
+        output_parts.append(
+            f"\n\n--- SOURCE {i+1}: {result['title']} ---\n"
+            f"URL: {url}\n\n"
+            f"SUMMARY:\n{content}\n\n"
+            f"\n\n{'-' * 80}\n"
+        )
 
-    return formatted_output
+    return "".join(output_parts)
 
 async def searxng_search_async(
     search_queries: List[str],
@@ -538,29 +671,44 @@ async def searxng_search_async(
     configurable = Configuration.from_runnable_config(config)
     searxng_url = configurable.searxng_url.rstrip('/')
 
-    async def execute_search(query: str):
+    # Optional caller-provided cache and HTTP session shared by all research units in a run
+    configurable_dict = config.get("configurable", {}) if config else {}
+    tool_cache = configurable_dict.get("tool_cache")
+    shared_session = configurable_dict.get("http_session")
+
+    # Applied per request so it also holds on a caller-provided session
+    timeout = aiohttp.ClientTimeout(total=30)
+
+    async def execute_search(session: aiohttp.ClientSession, query: str):
         """Execute a single SearXNG search query."""
-        try:
-            async with aiohttp.ClientSession() as session:
-                # SearXNG search endpoint with JSON format
-                search_url = f"{searxng_url}/search"
-                params = {
-                    'q': query,
-                    'format': 'json',
-                    'pageno': 1
-                }
+        # Reject malformed queries without a round-trip
+        if not isinstance(query, str) or not query.strip():
+            return {'query': query, 'results': []}
+
+        cache_key = ("searxng", query.strip().lower(), max_results)
+        if tool_cache is not None and cache_key in tool_cache:
+            return {'query': query, 'results': tool_cache[cache_key]}
 
-                async with session.get(search_url, params=params, timeout=30) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        # Add query to response for tracking
-                        return {
-                            'query': query,
-                            'results': data.get('results', [])[:max_results]
-                        }
-                    else:
-                        logging.warning(f"SearXNG search failed with status {response.status} for query: {query}")
-                        return {'query': query, 'results': []}
+        try:
+            # SearXNG search endpoint with JSON format
+            search_url = f"{searxng_url}/search"
+            params = {
+                'q': query,
+                'format': 'json',
+                'pageno': 1
+            }
+
+            async with session.get(search_url, params=params, timeout=timeout) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    results = data.get('results', [])[:max_results]
+                    if tool_cache is not None:
+                        tool_cache[cache_key] = results
+                    # Add query to response for tracking
+                    return {'query': query, 'results': results}
+                else:
+                    logging.warning(f"SearXNG search failed with status {response.status} for query: {query}")
+                    return {'query': query, 'results': []}
 
         except asyncio.TimeoutError:
             logging.warning(f"SearXNG search timed out for query: {query}")
@@ -569,17 +717,85 @@ async def searxng_search_async(
             logging.warning(f"SearXNG search error for query '{query}': {str(e)}")
             return {'query': query, 'results': []}
 
-    # Create search tasks for parallel execution
-    search_tasks = [execute_search(query) for query in search_queries]
+    # Send each distinct query once, preserving first-seen order
+    unique_queries = list(dict.fromkeys(search_queries))
+
+    async def run_searches(session: aiohttp.ClientSession):
+        """Execute all distinct queries in parallel on one session."""
+        return await asyncio.gather(*(execute_search(session, query) for query in unique_queries))
 
-    # Execute all search queries in parallel and return results
-    search_results = await asyncio.gather(*search_tasks)
-    return search_results
+    if shared_session is not None and not shared_session.closed:
+        # Reuse the caller's pool across tool calls; the caller owns its lifetime
+        search_results = await run_searches(shared_session)
+    else:
+        # Share one connection pool across all queries so keep-alive sockets are reused
+        connector = aiohttp.TCPConnector(limit=32, ttl_dns_cache=300)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            search_results = await run_searches(session)
+
+    # Map results back to every requested query
+    results_by_query = dict(zip(unique_queries, search_results))
+    return [results_by_query[query] for query in search_queries]
 
 ##########################
 # Ollama Tool Calling Emulation (ReAct Style)
 ##########################
 
+# Rendered tool descriptions, keyed by _tool_description_key
+_TOOL_DESCRIPTION_CACHE: Dict[Any, Optional[str]] = {}
+_TOOL_DESCRIPTION_CACHE_MAX_ENTRIES = 256
+
+def _tool_description_key(tool: Any) -> Any:
+    """Build a hashable cache key identifying a tool's rendered description."""
+    if isinstance(tool, dict):
+        # Native API tools are unhashable and trivial to render
+        return None
+    if isinstance(tool, type):
+        # Pydantic model tools are identified by their class
+        return tool
+    # LangChain tools are recreated per call, so key them by what gets rendered
+    return (type(tool), getattr(tool, 'name', None), getattr(tool, 'description', None))
+
+def _render_tool_for_ollama(tool: Any) -> Optional[str]:
+    """Render a single tool as a text description, or None if the type is unknown."""
+    # Handle different tool types
+    if isinstance(tool, dict):
+        # Native API tools like web_search
+        tool_name = tool.get('name', tool.get('type', 'unknown'))
+        tool_desc = f"Tool for {tool_name}"
+        return f"- **{tool_name}**: {tool_desc}"
+
+    elif isinstance(tool, type) and issubclass(tool, BaseModel):
+        # Pydantic model tools like ConductResearch
+        tool_name = tool.__name__
+        tool_desc = tool.__doc__ or f"Use {tool_name}"
+
+        # Get field information
+        fields_info = []
+        for field_name, field_info in tool.model_fields.items():
+            field_desc = field_info.description or ""
+            fields_info.append(f"  - {field_name}: {field_desc}")
+
+        tool_text = f"- **{tool_name}**: {tool_desc}"
+        if fields_info:
+            tool_text += "\n" + "\n".join(fields_info)
+        return tool_text
+
+    elif hasattr(tool, 'name') and hasattr(tool, 'description'):
+        # LangChain tools
+        tool_lines = [f"- **{tool.name}**: {tool.description}"]
+
+        # Add parameter info if available
+        if hasattr(tool, 'args_schema') and tool.args_schema:
+            schema = tool.args_schema.model_json_schema()
+            if 'properties' in schema:
+                for param_name, param_info in schema['properties'].items():
+                    param_desc = param_info.get('description', '')
+                    tool_lines.append(f"  - {param_name}: {param_desc}")
+        return "\n".join(tool_lines)
+
+    return None
+
 def format_tools_for_ollama(tools: List[Any]) -> str:
     """Format tools as text descriptions for Ollama models.
 
@@ -592,43 +808,30 @@ def format_tools_for_ollama(tools: List[Any]) -> str:
     tool_descriptions = []
 
     for tool in tools:
-        # Handle different tool types
-        if isinstance(tool, dict):
-            # Native API tools like web_search
-            tool_name = tool.get('name', tool.get('type', 'unknown'))
-            tool_desc = f"Tool for {tool_name}"
-            tool_descriptions.append(f"- **{tool_name}**: {tool_desc}")
-
-        elif isinstance(tool, type) and issubclass(tool, BaseModel):
-            # Pydantic model tools like ConductResearch
-            tool_name = tool.__name__
-            tool_desc = tool.__doc__ or f"Use {tool_name}"
-
-            # Get field information
-            fields_info = []
-            for field_name, field_info in tool.model_fields.items():
-                field_desc = field_info.description or ""
-                fields_info.append(f"  - {field_name}: {field_desc}")
-
-            tool_text = f"- **{tool_name}**: {tool_desc}"
-            if fields_info:
-                tool_text += "\n" + "\n".join(fields_info)
-            tool_descriptions.append(tool_text)
-
-        elif hasattr(tool, 'name') and hasattr(tool, 'description'):
-            # LangChain tools
-            tool_descriptions.append(f"- **{tool.name}**: {tool.description}")
-
-            # Add parameter info if available
-            if hasattr(tool, 'args_schema') and tool.args_schema:
-                schema = tool.args_schema.model_json_schema()
-                if 'properties' in schema:
-                    for param_name, param_info in schema['properties'].items():
-                        param_desc = param_info.get('description', '')
-                        tool_descriptions.append(f"  - {param_name}: {param_desc}")
+        key = _tool_description_key(tool)
+        if key is None:
+            description = _render_tool_for_ollama(tool)
+        elif key in _TOOL_DESCRIPTION_CACHE:
+            description = _TOOL_DESCRIPTION_CACHE[key]
+        else:
+            description = _render_tool_for_ollama(tool)
+            if len(_TOOL_DESCRIPTION_CACHE) >= _TOOL_DESCRIPTION_CACHE_MAX_ENTRIES:
+                _TOOL_DESCRIPTION_CACHE.clear()
+            _TOOL_DESCRIPTION_CACHE[key] = description
+
+        if description is not None:
+            tool_descriptions.append(description)
 
     return "\n".join(tool_descriptions)
 
+# ReAct markers in Title or upper case, anywhere in the text and optionally in
+# markdown emphasis ("**Action:**", "**Action**:"). The word boundary keeps
+# "Transaction:" out, and lowercase prose like "the final answer: ..." is not a marker
+_MD_EMPHASIS = r"(?:\*\*|__|\*|_)?"
+_FINAL_ANSWER_RE = re.compile(rf"\b(?:Final Answer|FINAL ANSWER){_MD_EMPHASIS}:{_MD_EMPHASIS}")
+_ACTION_RE = re.compile(rf"\b(?:Action|ACTION){_MD_EMPHASIS}:{_MD_EMPHASIS}")
+_ACTION_INPUT_RE = re.compile(rf"\b(?:Action Input|ACTION INPUT){_MD_EMPHASIS}:{_MD_EMPHASIS}")
+
 def parse_ollama_tool_call(response_text: str) -> tuple[str, dict | None]:
     """Parse Ollama model response for tool calls.
 
@@ -656,34 +859,24 @@ def parse_ollama_tool_call(response_text: str) -> tuple[str, dict | None]:
     response_text = response_text.strip()
 
     # Check for Final Answer
-    if "Final Answer:" in response_text or "FINAL ANSWER:" in response_text:
-        # Extract final answer
-        if "Final Answer:" in response_text:
-            final_answer = response_text.split("Final Answer:", 1)[1].strip()
-        else:
-            final_answer = response_text.split("FINAL ANSWER:", 1)[1].strip()
+    final_match = _FINAL_ANSWER_RE.search(response_text)
+    if final_match:
+        final_answer = response_text[final_match.end():].strip()
         return ("final_answer", final_answer)
 
     # Check for Action (tool call)
-    if "Action:" in response_text or "ACTION:" in response_text:
+    action_match = _ACTION_RE.search(response_text)
+    if action_match:
         try:
-            # Extract action and input
-            if "Action:" in response_text:
-                action_part = response_text.split("Action:", 1)[1]
-            else:
-                action_part = response_text.split("ACTION:", 1)[1]
-
             # Get tool name (first line after Action:)
-            lines = action_part.strip().split('\n')
-            tool_name = lines[0].strip()
+            action_part = response_text[action_match.end():]
+            tool_name = action_part.strip().partition('\n')[0].strip()
 
             # Get action input
             action_input = {}
-            if "Action Input:" in response_text or "ACTION INPUT:" in response_text:
-                if "Action Input:" in response_text:
-                    input_part = response_text.split("Action Input:", 1)[1].strip()
-                else:
-                    input_part = response_text.split("ACTION INPUT:", 1)[1].strip()
+            input_match = _ACTION_INPUT_RE.search(response_text)
+            if input_match:
+                input_part = response_text[input_match.end():].strip()
 
                 # Try to parse as JSON
                 # Look for JSON block
@@ -693,7 +886,7 @@ def parse_ollama_tool_call(response_text: str) -> tuple[str, dict | None]:
                     if json_end > json_start:
                         json_str = input_part[json_start:json_end]
                         try:
-                            action_input = json.loads(json_str)
+                            action_input = _json_loads(json_str)
                         except json.JSONDecodeError:
                             # If JSON parsing fails, use the raw string
                             action_input = {"input": input_part}
@@ -710,6 +903,30 @@ def parse_ollama_tool_call(response_text: str) -> tuple[str, dict | None]:
     # No clear action detected
     return ("none", None)
 
+# Static parts of the ReAct instruction; only the tools block varies per call
+_REACT_PREFIX = """You are a helpful AI assistant that can use tools to help answer questions.
+
+Available Tools:
+"""
+
+_REACT_SUFFIX = """
+
+To use a tool, respond in this exact format:
+Thought: [Your reasoning about what to do next]
+Action: [Tool name from the list above]
+Action Input: {"parameter": "value"}
+
+When you have enough information to provide a final answer, respond in this format:
+Thought: [Your final reasoning]
+Final Answer: [Your complete answer]
+
+IMPORTANT:
+- Always start with "Thought:" to explain your reasoning
+- Use "Action:" with the EXACT tool name from the available tools list
+- Use "Action Input:" with valid JSON containing the required parameters
+- Use "Final Answer:" only when you're ready to provide the complete final response
+- Only call ONE tool per response"""
+
 async def get_ollama_react_response(
     model: BaseChatModel,
     messages: List[MessageLikeRepresentation],
@@ -735,39 +952,23 @@ async def get_ollama_react_response(
     tools_text = format_tools_for_ollama(tools)
 
     # Create ReAct instruction
-    react_instruction = f"""You are a helpful AI assistant that can use tools to help answer questions.
-
-Available Tools:
-{tools_text}
-
-To use a tool, respond in this exact format:
-Thought: [Your reasoning about what to do next]
-Action: [Tool name from the list above]
-Action Input: {{"parameter": "value"}}
-
-When you have enough information to provide a final answer, respond in this format:
-Thought: [Your final reasoning]
-Final Answer: [Your complete answer]
-
-IMPORTANT:
-- Always start with "Thought:" to explain your reasoning
-- Use "Action:" with the EXACT tool name from the available tools list
-- Use "Action Input:" with valid JSON containing the required parameters
-- Use "Final Answer:" only when you're ready to provide the complete final response
-- Only call ONE tool per response"""
+    react_instruction = _REACT_PREFIX + tools_text + _REACT_SUFFIX
 
     # Add system prompt if provided
     if system_prompt:
         react_instruction = system_prompt + "\n\n" + react_instruction
 
     # Create working message list with ReAct instructions
-    working_messages = [SystemMessage(content=react_instruction)] + list(messages)
+    working_messages = [SystemMessage(content=react_instruction), *messages]
 
     # Get model response
     response = await model.ainvoke(working_messages)
 
     return response
 
+# Target parameter for think_tool and the names LLMs commonly use instead, in priority order
+_THINK_TOOL_ALIASES = ("reflection", ("prompt", "thought", "thinking", "question", "input", "content"))
+
 def normalize_tool_parameters(tool_name: str, tool_input: dict) -> dict:
     """Normalize tool parameters to handle common LLM variations in parameter naming.
 
@@ -784,28 +985,31 @@ def normalize_tool_parameters(tool_name: str, tool_input: dict) -> dict:
     if not isinstance(tool_input, dict):
         return tool_input
 
-    normalized = tool_input.copy()
-
     # Normalize think_tool parameters
     if tool_name == "think_tool":
-        # Map common variations to 'reflection'
-        if 'reflection' not in normalized:
-            for alt_key in ['prompt', 'thought', 'thinking', 'question', 'input', 'content']:
-                if alt_key in normalized:
-                    normalized['reflection'] = normalized.pop(alt_key)
-                    break
-            # If still no reflection and dict is not empty, use first value
-            if 'reflection' not in normalized and normalized:
-                first_key = list(normalized.keys())[0]
-                normalized['reflection'] = normalized.pop(first_key)
-            # If dict is empty, provide a default
-            if 'reflection' not in normalized:
-                normalized['reflection'] = "Reflecting on progress..."
+        target, aliases = _THINK_TOOL_ALIASES
+        if target in tool_input:
+            return tool_input
+
+        # Map common variations to 'reflection', copying only when rewriting
+        normalized = tool_input.copy()
+        alias = next((key for key in aliases if key in normalized), None)
+        if alias is not None:
+            normalized[target] = normalized.pop(alias)
+        # If still no reflection and dict is not empty, use first value
+        elif normalized:
+            first_key = next(iter(normalized))
+            normalized[target] = normalized.pop(first_key)
+        # If dict is empty, provide a default
+        else:
+            normalized[target] = "Reflecting on progress..."
+        return normalized
 
     # Normalize searxng_search parameters
     elif tool_name == "searxng_search":
         # Convert 'query' (singular) to 'queries' (list)
-        if 'queries' not in normalized and 'query' in normalized:
+        if 'queries' not in tool_input and 'query' in tool_input:
+            normalized = tool_input.copy()
             query_value = normalized.pop('query')
             # Ensure it's a list
             if isinstance(query_value, str):
@@ -814,76 +1018,144 @@ def normalize_tool_parameters(tool_name: str, tool_input: dict) -> dict:
                 normalized['queries'] = query_value
             else:
                 normalized['queries'] = [str(query_value)]
+            return normalized
         # Ensure queries is a list if present
-        elif 'queries' in normalized and not isinstance(normalized['queries'], list):
-            normalized['queries'] = [str(normalized['queries'])]
-
-    return normalized
-
-async def execute_tool(tools: List[Any], tool_name: str, tool_input: dict) -> str:
-    """Execute a tool and return its result as a string.
+        elif 'queries' in tool_input and not isinstance(tool_input['queries'], list):
+            return {**tool_input, 'queries': [str(tool_input['queries'])]}
+
+    return tool_input
+
+# Cap on concurrent remote tool invocations (search and MCP), one semaphore per event loop
+MAX_CONCURRENT_TOOLS = int(os.getenv("MAX_CONCURRENT_TOOLS", "10"))
+_TOOL_SEMAPHORES: Dict[asyncio.AbstractEventLoop, asyncio.Semaphore] = {}
+
+def _get_tool_semaphore() -> asyncio.Semaphore:
+    """Return the tool concurrency semaphore for the running event loop."""
+    loop = asyncio.get_running_loop()
+    semaphore = _TOOL_SEMAPHORES.get(loop)
+    if semaphore is None:
+        # A semaphore that has waited holds its loop, so weak keys would never
+        # expire; drop the entries of closed loops instead
+        for stale_loop in [stale for stale in _TOOL_SEMAPHORES if stale.is_closed()]:
+            del _TOOL_SEMAPHORES[stale_loop]
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_TOOLS)
+        _TOOL_SEMAPHORES[loop] = semaphore
+    return semaphore
+
+# Signature of the per-tool coroutines execute_tool dispatches to
+_ToolRunner = Callable[[dict], Awaitable[str]]
+
+def _make_tool_runner(tool_name: str, tool: Any, gated: bool = False) -> _ToolRunner:
+    """Build a coroutine that executes one tool, with its kind resolved up front.
 
     Args:
-        tools: List of available tools
-        tool_name: Name of the tool to execute
-        tool_input: Parameters for the tool
+        tool_name: Name the tool is called by
+        tool: The tool object (dict spec, pydantic model class, LangChain tool or callable)
+        gated: Whether async invocations count against MAX_CONCURRENT_TOOLS
 
     Returns:
-        String representation of the tool's result
+        Coroutine function taking normalized tool input and returning the result as a string
     """
-    # Normalize tool input parameters for common variations
-    tool_input = normalize_tool_parameters(tool_name, tool_input)
-
-    # Find the tool
-    target_tool = None
-    for tool in tools:
-        if isinstance(tool, dict):
-            if tool.get('name') == tool_name or tool.get('type') == tool_name:
-                target_tool = tool
-                break
-        elif isinstance(tool, type) and issubclass(tool, BaseModel):
-            if tool.__name__ == tool_name:
-                target_tool = tool
-                break
-        elif hasattr(tool, 'name') and tool.name == tool_name:
-            target_tool = tool
-            break
-
-    if target_tool is None:
-        return f"Error: Tool '{tool_name}' not found. Available tools: {', '.join([str(t.get('name', t.__name__ if hasattr(t, '__name__') else str(t))) for t in tools])}"
-
-    try:
-        # Execute based on tool type
-        if isinstance(target_tool, dict):
+    if isinstance(tool, dict):
+        async def run(tool_input: dict) -> str:
             # Can't execute dict-based tools (they're API-level)
             return f"Tool {tool_name} requires API-level support (not available with Ollama)"
 
-        elif isinstance(target_tool, type) and issubclass(target_tool, BaseModel):
+    elif isinstance(tool, type) and issubclass(tool, BaseModel):
+        async def run(tool_input: dict) -> str:
             # Pydantic model tool - return instantiated object
-            instance = target_tool(**tool_input)
+            instance = tool(**tool_input)
             return f"Called {tool_name}: {instance.model_dump_json()}"
 
-        elif hasattr(target_tool, 'ainvoke'):
-            # Async LangChain tool
-            result = await target_tool.ainvoke(tool_input)
+    elif hasattr(tool, 'ainvoke') and gated:
+        async def run(tool_input: dict) -> str:
+            # Remote async LangChain tool, capped so bursts don't trip rate limits
+            async with _get_tool_semaphore():
+                result = await tool.ainvoke(tool_input)
             return str(result)
 
-        elif hasattr(target_tool, 'invoke'):
-            # Sync LangChain tool
-            result = target_tool.invoke(tool_input)
+    elif hasattr(tool, 'ainvoke'):
+        async def run(tool_input: dict) -> str:
+            # Local async LangChain tool
+            result = await tool.ainvoke(tool_input)
             return str(result)
 
-        elif callable(target_tool):
-            # Callable tool
-            if asyncio.iscoroutinefunction(target_tool):
-                result = await target_tool(**tool_input)
-            else:
-                result = target_tool(**tool_input)
+    elif hasattr(tool, 'invoke'):
+        async def run(tool_input: dict) -> str:
+            # Sync LangChain tool, run in a worker thread so it doesn't block the event loop
+            result = await asyncio.to_thread(tool.invoke, tool_input)
             return str(result)
 
-        else:
+    elif callable(tool) and asyncio.iscoroutinefunction(tool):
+        async def run(tool_input: dict) -> str:
+            # Async callable tool
+            result = await tool(**tool_input)
+            return str(result)
+
+    elif callable(tool):
+        async def run(tool_input: dict) -> str:
+            # Sync callable tool, run in a worker thread so it doesn't block the event loop
+            result = await asyncio.to_thread(functools.partial(tool, **tool_input))
+            return str(result)
+
+    else:
+        async def run(tool_input: dict) -> str:
             return f"Error: Don't know how to execute tool {tool_name}"
 
+    return run
+
+def _tool_names(tool: Any) -> tuple:
+    """Names a tool can be called by, or an empty tuple if it has none."""
+    if isinstance(tool, dict):
+        return tuple(name for name in (tool.get('name'), tool.get('type')) if name is not None)
+    if isinstance(tool, type) and issubclass(tool, BaseModel):
+        return (tool.__name__,)
+    if hasattr(tool, 'name'):
+        return (tool.name,)
+    return ()
+
+# Core research tools run in-process; every other tool (search, MCP) calls out
+# and shares the MAX_CONCURRENT_TOOLS cap
+_LOCAL_TOOL_NAMES = frozenset({ResearchComplete.__name__, "think_tool"})
+
+def build_tool_runners(tools: List[Any]) -> Dict[str, _ToolRunner]:
+    """Build the tool name to runner table execute_tool dispatches on.
+
+    The first tool with a given name wins, as with a linear scan of the list.
+
+    Args:
+        tools: List of available tools, e.g. from get_all_tools
+
+    Returns:
+        Dictionary mapping each callable tool name to its runner
+    """
+    tool_runners: Dict[str, _ToolRunner] = {}
+    for tool in tools:
+        for name in _tool_names(tool):
+            if name not in tool_runners:
+                tool_runners[name] = _make_tool_runner(name, tool, gated=name not in _LOCAL_TOOL_NAMES)
+    return tool_runners
+
+async def execute_tool(tool_runners: Dict[str, _ToolRunner], tool_name: str, tool_input: dict) -> str:
+    """Execute a tool and return its result as a string.
+
+    Args:
+        tool_runners: Tool name to runner table from build_tool_runners
+        tool_name: Name of the tool to execute
+        tool_input: Parameters for the tool
+
+    Returns:
+        String representation of the tool's result
+    """
+    # Find the tool
+    run_tool = tool_runners.get(tool_name)
+    if run_tool is None:
+        return f"Error: Tool '{tool_name}' not found. Available tools: {', '.join(tool_runners)}"
+
+    try:
+        # Normalize tool input parameters for common variations, then execute
+        return await run_tool(normalize_tool_parameters(tool_name, tool_input))
+
     except Exception as e:
         logging.error(f"Error executing tool {tool_name}: {e}")
         return f"Error executing {tool_name}: {str(e)}"
@@ -923,15 +1195,33 @@ def think_tool(reflection: str) -> str:
 # MCP Utils
 ##########################
 
+async def _post_token_exchange(
+    session: aiohttp.ClientSession, base_mcp_url: str, form_data: Dict[str, str]
+) -> Optional[Dict[str, Any]]:
+    """POST a token exchange request and return the token data, or None on failure."""
+    token_url = base_mcp_url.rstrip("/") + "/oauth/token"
+    headers = {"Content-Type": "application/x-www-form-urlencoded"}
+
+    async with session.post(token_url, headers=headers, data=form_data) as response:
+        if response.status == 200:
+            # Successfully obtained token
+            return _json_loads(await response.read())
+        # Log error details for debugging
+        response_text = await response.text()
+        logging.error(f"Token exchange failed: {response_text}")
+        return None
+
 async def get_mcp_access_token(
     supabase_token: str,
     base_mcp_url: str,
+    http_session: Optional[aiohttp.ClientSession] = None,
 ) -> Optional[Dict[str, Any]]:
     """Exchange Supabase token for MCP access token using OAuth token exchange.
     
     Args:
         supabase_token: Valid Supabase authentication token
         base_mcp_url: Base URL of the MCP server
+        http_session: Caller-owned session to reuse; a short-lived one is opened otherwise
         
     Returns:
         Token data dictionary if successful, None if failed
@@ -946,26 +1236,39 @@ async def get_mcp_access_token(
             "subject_token_type": "urn:ietf:params:oauth:token-type:access_token",
         }
         
-        # Execute token exchange request
+        # Execute token exchange request, reusing the caller's keep-alive pool when given
+        if http_session is not None:
+            return await _post_token_exchange(http_session, base_mcp_url, form_data)
         async with aiohttp.ClientSession() as session:
-            token_url = base_mcp_url.rstrip("/") + "/oauth/token"
-            headers = {"Content-Type": "application/x-www-form-urlencoded"}
-            
-            async with session.post(token_url, headers=headers, data=form_data) as response:
-                if response.status == 200:
-                    # Successfully obtained token
-                    token_data = await response.json()
-                    return token_data
-                else:
-                    # Log error details for debugging
-                    response_text = await response.text()
-                    logging.error(f"Token exchange failed: {response_text}")
+            return await _post_token_exchange(session, base_mcp_url, form_data)
                     
     except Exception as e:
         logging.error(f"Error during token exchange: {e}")
     
     return None
 
+# Per-user tokens as (monotonic expiry, tokens), avoiding a store read on every tool load
+_TOKEN_CACHE: Dict[str, tuple[float, dict[str, Any]]] = {}
+_TOKEN_REFRESH_MARGIN_SECONDS = 30.0
+
+# In-flight background refreshes, at most one per user
+_REFRESH_TASKS: Dict[str, asyncio.Task] = {}
+
+def _schedule_token_refresh(user_id: str, config: RunnableConfig) -> None:
+    """Start a background token refresh for a user unless one is already running."""
+    if user_id in _REFRESH_TASKS:
+        return
+    task = asyncio.create_task(_exchange_and_store_tokens(config))
+    _REFRESH_TASKS[user_id] = task
+
+    def _on_refresh_done(done: asyncio.Task) -> None:
+        # Nothing awaits the task, so retrieve its error here rather than at GC time
+        if not done.cancelled() and done.exception() is not None:
+            logging.error(f"Background MCP token refresh failed: {done.exception()}")
+        _REFRESH_TASKS.pop(user_id, None)
+
+    task.add_done_callback(_on_refresh_done)
+
 async def get_tokens(config: RunnableConfig):
     """Retrieve stored authentication tokens with expiration validation.
     
@@ -985,6 +1288,18 @@ async def get_tokens(config: RunnableConfig):
     user_id = config.get("metadata", {}).get("owner")
     if not user_id:
         return None
+
+    # Serve in-process cached tokens, refreshing in the background shortly before expiry
+    cached = _TOKEN_CACHE.get(user_id)
+    if cached is not None:
+        expires_at, cached_tokens = cached
+        remaining = expires_at - time.monotonic()
+        if remaining > _TOKEN_REFRESH_MARGIN_SECONDS:
+            return cached_tokens
+        if remaining > 0:
+            _schedule_token_refresh(user_id, config)
+            return cached_tokens
+        del _TOKEN_CACHE[user_id]
     
     # Retrieve stored tokens
     tokens = await store.aget((user_id, "tokens"), "data")
@@ -998,10 +1313,11 @@ async def get_tokens(config: RunnableConfig):
     expiration_time = created_at + timedelta(seconds=expires_in)
     
     if current_time > expiration_time:
-        # Token expired, clean up and return None
-        await store.adelete((user_id, "tokens"), "data")
+        # Token expired; leave the entry for set_tokens to overwrite instead of deleting it first
         return None
 
+    remaining_seconds = (expiration_time - current_time).total_seconds()
+    _TOKEN_CACHE[user_id] = (time.monotonic() + remaining_seconds, tokens.value)
     return tokens.value
 
 async def set_tokens(config: RunnableConfig, tokens: dict[str, Any]):
@@ -1024,6 +1340,7 @@ async def set_tokens(config: RunnableConfig, tokens: dict[str, Any]):
     
     # Store the tokens
     await store.aput((user_id, "tokens"), "data", tokens)
+    _TOKEN_CACHE[user_id] = (time.monotonic() + tokens.get("expires_in", 0), tokens)
 
 async def fetch_tokens(config: RunnableConfig) -> dict[str, Any]:
     """Fetch and refresh MCP tokens, obtaining new ones if needed.
@@ -1038,7 +1355,18 @@ async def fetch_tokens(config: RunnableConfig) -> dict[str, Any]:
     current_tokens = await get_tokens(config)
     if current_tokens:
         return current_tokens
-    
+
+    return await _exchange_and_store_tokens(config)
+
+async def _exchange_and_store_tokens(config: RunnableConfig) -> Optional[dict[str, Any]]:
+    """Obtain new MCP tokens via token exchange and store them.
+
+    Args:
+        config: Runtime configuration with authentication details
+
+    Returns:
+        New token dictionary, or None if unable to obtain tokens
+    """
     # Extract Supabase token for new token exchange
     supabase_token = config.get("configurable", {}).get("x-supabase-access-token")
     if not supabase_token:
@@ -1050,7 +1378,9 @@ async def fetch_tokens(config: RunnableConfig) -> dict[str, Any]:
         return None
     
     # Exchange Supabase token for MCP tokens
-    mcp_tokens = await get_mcp_access_token(supabase_token, mcp_config.get("url"))
+    mcp_tokens = await get_mcp_access_token(
+        supabase_token, mcp_config.get("url"), config.get("configurable", {}).get("http_session")
+    )
     if not mcp_tokens:
         return None
 
@@ -1058,6 +1388,20 @@ async def fetch_tokens(config: RunnableConfig) -> dict[str, Any]:
     await set_tokens(config, mcp_tokens)
     return mcp_tokens
 
+def _find_mcp_error_in_exception_chain(exc: BaseException) -> McpError | None:
+    """Search an exception and any nested ExceptionGroup members for the first MCP error."""
+    stack = [exc]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, McpError):
+            return current
+
+        # Handle ExceptionGroup (Python 3.11+) by checking attributes, visiting members in order
+        sub_exceptions = getattr(current, 'exceptions', None)
+        if sub_exceptions:
+            stack.extend(reversed(sub_exceptions))
+    return None
+
 def wrap_mcp_authenticate_tool(tool: StructuredTool) -> StructuredTool:
     """Wrap MCP tool with comprehensive authentication and error handling.
     
@@ -1071,19 +1415,6 @@ def wrap_mcp_authenticate_tool(tool: StructuredTool) -> StructuredTool:
     
     async def authentication_wrapper(**kwargs):
         """Enhanced coroutine with MCP error handling and user-friendly messages."""
-        
-        def _find_mcp_error_in_exception_chain(exc: BaseException) -> McpError | None:
-            """Recursively search for MCP errors in exception chains."""
-            if isinstance(exc, McpError):
-                return exc
-            
-            # Handle ExceptionGroup (Python 3.11+) by checking attributes
-            if hasattr(exc, 'exceptions'):
-                for sub_exception in exc.exceptions:
-                    if found_error := _find_mcp_error_in_exception_chain(sub_exception):
-                        return found_error
-            return None
-        
         try:
             # Execute the original tool functionality
             return await original_coroutine(**kwargs)
@@ -1125,17 +1456,20 @@ def wrap_mcp_authenticate_tool(tool: StructuredTool) -> StructuredTool:
 async def load_mcp_tools(
     config: RunnableConfig,
     existing_tool_names: set[str],
+    configurable: Optional[Configuration] = None,
 ) -> list[BaseTool]:
     """Load and configure MCP (Model Context Protocol) tools with authentication.
     
     Args:
         config: Runtime configuration containing MCP server details
         existing_tool_names: Set of tool names already in use to avoid conflicts
+        configurable: Configuration already parsed from config, parsed here if omitted
         
     Returns:
         List of configured MCP tools ready for use
     """
-    configurable = Configuration.from_runnable_config(config)
+    if configurable is None:
+        configurable = Configuration.from_runnable_config(config)
     
     # Step 1: Handle authentication if required
     if configurable.mcp_config and configurable.mcp_config.auth_required:
@@ -1180,17 +1514,18 @@ async def load_mcp_tools(
         return []
     
     # Step 5: Filter and configure tools
+    allowed_tool_names = set(configurable.mcp_config.tools)
     configured_tools = []
     for mcp_tool in available_mcp_tools:
         # Skip tools with conflicting names
         if mcp_tool.name in existing_tool_names:
-            warnings.warn(
-                f"MCP tool '{mcp_tool.name}' conflicts with existing tool name - skipping"
+            logging.warning(
+                "MCP tool '%s' conflicts with existing tool name - skipping", mcp_tool.name
             )
             continue
         
         # Only include tools specified in configuration
-        if mcp_tool.name not in set(configurable.mcp_config.tools):
+        if mcp_tool.name not in allowed_tool_names:
             continue
         
         # Wrap tool with authentication handling and add to list
@@ -1204,7 +1539,7 @@ async def load_mcp_tools(
 # Tool Utils
 ##########################
 
-async def get_search_tool(search_api: SearchAPI):
+def get_search_tool(search_api: SearchAPI):
     """Configure and return search tools based on the specified API provider.
 
     Args:
@@ -1213,17 +1548,22 @@ async def get_search_tool(search_api: SearchAPI):
     Returns:
         List of configured search tool objects for the specified provider
     """
+    return list(_configure_search_tools(search_api))
+
+@functools.cache
+def _configure_search_tools(search_api: SearchAPI) -> tuple:
+    """Build the search tools for a provider once; tool metadata is merged on first use only."""
     if search_api == SearchAPI.ANTHROPIC:
         # Anthropic's native web search with usage limits
-        return [{
+        return ({
             "type": "web_search_20250305",
             "name": "web_search",
             "max_uses": 5
-        }]
+        },)
 
     elif search_api == SearchAPI.OPENAI:
         # OpenAI's web search preview functionality
-        return [{"type": "web_search_preview"}]
+        return ({"type": "web_search_preview"},)
 
     elif search_api == SearchAPI.TAVILY:
         # Configure Tavily search tool with metadata
@@ -1233,7 +1573,7 @@ async def get_search_tool(search_api: SearchAPI):
             "type": "search",
             "name": "web_search"
         }
-        return [search_tool]
+        return (search_tool,)
 
     elif search_api == SearchAPI.SEARXNG:
         # Configure SearXNG local search tool with metadata
@@ -1243,15 +1583,15 @@ async def get_search_tool(search_api: SearchAPI):
             "type": "search",
             "name": "web_search"
         }
-        return [search_tool]
+        return (search_tool,)
 
     elif search_api == SearchAPI.NONE:
         # No search functionality configured
-        return []
+        return ()
 
     # Default fallback for unknown search API types
-    return []
-    
+    return ()
+
 async def get_all_tools(config: RunnableConfig):
     """Assemble complete toolkit including research, search, and MCP tools.
     
@@ -1267,17 +1607,17 @@ async def get_all_tools(config: RunnableConfig):
     # Add configured search tools
     configurable = Configuration.from_runnable_config(config)
     search_api = SearchAPI(get_config_value(configurable.search_api))
-    search_tools = await get_search_tool(search_api)
+    search_tools = get_search_tool(search_api)
     tools.extend(search_tools)
     
     # Track existing tool names to prevent conflicts
     existing_tool_names = {
-        tool.name if hasattr(tool, "name") else tool.get("name", "web_search") 
+        tool.get("name", "web_search") if isinstance(tool, dict) else tool.name
         for tool in tools
     }
     
     # Add MCP tools if configured
-    mcp_tools = await load_mcp_tools(config, existing_tool_names)
+    mcp_tools = await load_mcp_tools(config, existing_tool_names, configurable)
     tools.extend(mcp_tools)
     
     return tools
@@ -1300,23 +1640,10 @@ def anthropic_websearch_called(response):
         True if web search was called, False otherwise
     """
     try:
-        # Navigate through the response metadata structure
-        usage = response.response_metadata.get("usage")
-        if not usage:
-            return False
-        
-        # Check for server-side tool usage information
-        server_tool_use = usage.get("server_tool_use")
-        if not server_tool_use:
-            return False
-        
-        # Look for web search request count
-        web_search_requests = server_tool_use.get("web_search_requests")
-        if web_search_requests is None:
-            return False
-        
-        # Return True if any web search requests were made
-        return web_search_requests > 0
+        # Look for a web search request count in the server-side tool usage metadata
+        usage = response.response_metadata.get("usage") or {}
+        server_tool_use = usage.get("server_tool_use") or {}
+        return (server_tool_use.get("web_search_requests") or 0) > 0
         
     except (AttributeError, TypeError):
         # Handle cases where response structure is unexpected
@@ -1331,23 +1658,32 @@ def openai_websearch_called(response):
     Returns:
         True if web search was called, False otherwise
     """
-    # Check for tool outputs in the response metadata
-    tool_outputs = response.additional_kwargs.get("tool_outputs")
-    if not tool_outputs:
-        return False
-    
-    # Look for web search calls in the tool outputs
-    for tool_output in tool_outputs:
-        if tool_output.get("type") == "web_search_call":
-            return True
-    
-    return False
+    # Look for web search calls in the tool outputs of the response metadata
+    tool_outputs = response.additional_kwargs.get("tool_outputs") or ()
+    return any(tool_output.get("type") == "web_search_call" for tool_output in tool_outputs)
 
 
 ##########################
 # Token Limit Exceeded Utils
 ##########################
 
+# Model name prefix (before the first ':') -> provider whose token limit errors to check
+_TOKEN_LIMIT_PROVIDERS = {
+    'openai': 'openai',
+    'anthropic': 'anthropic',
+    'gemini': 'gemini',
+    'google': 'gemini',
+}
+
+# Token-related keywords in OpenAI error messages ('maximum context' is covered by 'context')
+_OPENAI_TOKEN_KEYWORDS_RE = re.compile(r"token|context|length|reduce")
+
+@functools.lru_cache(maxsize=128)
+def _exception_class_info(exception_class: type) -> tuple[str, str, str]:
+    """Return (class name, lowercased type repr, lowercased module) for an exception class."""
+    module_name = getattr(exception_class, '__module__', '') or ''
+    return exception_class.__name__, str(exception_class).lower(), module_name.lower()
+
 def is_token_limit_exceeded(exception: Exception, model_name: str = None) -> bool:
     """Determine if an exception indicates a token/context limit was exceeded.
     
@@ -1358,54 +1694,42 @@ def is_token_limit_exceeded(exception: Exception, model_name: str = None) -> boo
     Returns:
         True if the exception indicates a token limit was exceeded, False otherwise
     """
-    error_str = str(exception).lower()
-    
     # Step 1: Determine provider from model name if available
     provider = None
     if model_name:
-        model_str = str(model_name).lower()
-        if model_str.startswith('openai:'):
-            provider = 'openai'
-        elif model_str.startswith('anthropic:'):
-            provider = 'anthropic'
-        elif model_str.startswith('gemini:') or model_str.startswith('google:'):
-            provider = 'gemini'
+        prefix, separator, _ = str(model_name).lower().partition(':')
+        if separator:
+            provider = _TOKEN_LIMIT_PROVIDERS.get(prefix)
     
     # Step 2: Check provider-specific token limit patterns
     if provider == 'openai':
-        return _check_openai_token_limit(exception, error_str)
+        return _check_openai_token_limit(exception)
     elif provider == 'anthropic':
-        return _check_anthropic_token_limit(exception, error_str)
+        return _check_anthropic_token_limit(exception)
     elif provider == 'gemini':
-        return _check_gemini_token_limit(exception, error_str)
+        return _check_gemini_token_limit(exception)
     
     # Step 3: If provider unknown, check all providers
     return (
-        _check_openai_token_limit(exception, error_str) or
-        _check_anthropic_token_limit(exception, error_str) or
-        _check_gemini_token_limit(exception, error_str)
+        _check_openai_token_limit(exception) or
+        _check_anthropic_token_limit(exception) or
+        _check_gemini_token_limit(exception)
     )
 
-def _check_openai_token_limit(exception: Exception, error_str: str) -> bool:
+def _check_openai_token_limit(exception: Exception) -> bool:
     """Check if exception indicates OpenAI token limit exceeded."""
     # Analyze exception metadata
-    exception_type = str(type(exception))
-    class_name = exception.__class__.__name__
-    module_name = getattr(exception.__class__, '__module__', '')
+    class_name, exception_type, module_name = _exception_class_info(exception.__class__)
     
     # Check if this is an OpenAI exception
-    is_openai_exception = (
-        'openai' in exception_type.lower() or 
-        'openai' in module_name.lower()
-    )
+    is_openai_exception = 'openai' in exception_type or 'openai' in module_name
     
     # Check for typical OpenAI token limit error types
     is_request_error = class_name in ['BadRequestError', 'InvalidRequestError']
     
     if is_openai_exception and is_request_error:
-        # Look for token-related keywords in error message
-        token_keywords = ['token', 'context', 'length', 'maximum context', 'reduce']
-        if any(keyword in error_str for keyword in token_keywords):
+        # Look for token-related keywords in error message, rendered only once the class matches
+        if _OPENAI_TOKEN_KEYWORDS_RE.search(str(exception).lower()):
             return True
     
     # Check for specific OpenAI error codes
@@ -1419,41 +1743,31 @@ def _check_openai_token_limit(exception: Exception, error_str: str) -> bool:
     
     return False
 
-def _check_anthropic_token_limit(exception: Exception, error_str: str) -> bool:
+def _check_anthropic_token_limit(exception: Exception) -> bool:
     """Check if exception indicates Anthropic token limit exceeded."""
     # Analyze exception metadata
-    exception_type = str(type(exception))
-    class_name = exception.__class__.__name__
-    module_name = getattr(exception.__class__, '__module__', '')
+    class_name, exception_type, module_name = _exception_class_info(exception.__class__)
     
     # Check if this is an Anthropic exception
-    is_anthropic_exception = (
-        'anthropic' in exception_type.lower() or 
-        'anthropic' in module_name.lower()
-    )
+    is_anthropic_exception = 'anthropic' in exception_type or 'anthropic' in module_name
     
     # Check for Anthropic-specific error patterns
     is_bad_request = class_name == 'BadRequestError'
     
     if is_anthropic_exception and is_bad_request:
         # Anthropic uses specific error messages for token limits
-        if 'prompt is too long' in error_str:
+        if 'prompt is too long' in str(exception).lower():
             return True
     
     return False
 
-def _check_gemini_token_limit(exception: Exception, error_str: str) -> bool:
+def _check_gemini_token_limit(exception: Exception) -> bool:
     """Check if exception indicates Google/Gemini token limit exceeded."""
     # Analyze exception metadata
-    exception_type = str(type(exception))
-    class_name = exception.__class__.__name__
-    module_name = getattr(exception.__class__, '__module__', '')
+    class_name, exception_type, module_name = _exception_class_info(exception.__class__)
     
     # Check if this is a Google/Gemini exception
-    is_google_exception = (
-        'google' in exception_type.lower() or 
-        'google' in module_name.lower()
-    )
+    is_google_exception = 'google' in exception_type or 'google' in module_name
     
     # Check for Google-specific resource exhaustion errors
     is_resource_exhausted = class_name in [
@@ -1465,7 +1779,7 @@ def _check_gemini_token_limit(exception: Exception, error_str: str) -> bool:
         return True
     
     # Check for specific Google API resource exhaustion patterns
-    if 'google.api_core.exceptions.resourceexhausted' in exception_type.lower():
+    if 'google.api_core.exceptions.resourceexhausted' in exception_type:
         return True
     
     return False
@@ -1514,6 +1828,17 @@ MODEL_TOKEN_LIMITS = {
     "anthropic.claude-opus-4-1-20250805-v1:0": 200000,
 }
 
+def _build_model_index(limits: Dict[str, int]) -> Dict[str, Dict[str, int]]:
+    """Group token limits by provider prefix, keeping table order within each provider."""
+    index: Dict[str, Dict[str, int]] = {}
+    for model_key, token_limit in limits.items():
+        provider = model_key.partition(':')[0]
+        index.setdefault(provider, {})[model_key] = token_limit
+    return index
+
+_MODEL_INDEX = _build_model_index(MODEL_TOKEN_LIMITS)
+
+@functools.lru_cache(maxsize=256)
 def get_model_token_limit(model_string):
     """Look up the token limit for a specific model.
     
@@ -1523,7 +1848,13 @@ def get_model_token_limit(model_string):
     Returns:
         Token limit as integer if found, None if model not in lookup table
     """
-    # Search through known model token limits
+    # Search the known limits for this provider first
+    provider = model_string.partition(':')[0]
+    for model_key, token_limit in _MODEL_INDEX.get(provider, {}).items():
+        if model_key in model_string:
+            return token_limit
+
+    # Fall back to the full table for keys embedded elsewhere in the string
     for model_key, token_limit in MODEL_TOKEN_LIMITS.items():
         if model_key in model_string:
             return token_limit
@@ -1543,10 +1874,12 @@ def remove_up_to_last_ai_message(messages: list[MessageLikeRepresentation]) -> l
         Truncated message list up to (but not including) the last AI message
     """
     # Search backwards through messages to find the last AI message
-    for i in range(len(messages) - 1, -1, -1):
-        if isinstance(messages[i], AIMessage):
+    # (isinstance, not an exact type check, so AIMessageChunk still counts)
+    last_index = len(messages) - 1
+    for offset, message in enumerate(reversed(messages)):
+        if isinstance(message, AIMessage):
             # Return everything up to (but not including) the last AI message
-            return messages[:i]
+            return messages[:last_index - offset]
     
     # No AI messages found, return original list
     return messages
@@ -1555,14 +1888,25 @@ def remove_up_to_last_ai_message(messages: list[MessageLikeRepresentation]) -> l
 # Misc Utils
 ##########################
 
+# Formatted date and the wall-clock timestamp of the next local midnight, when it goes stale
+_today_str_cache: tuple[float, str] = (float("-inf"), "")
+
 def get_today_str() -> str:
     """Get current date formatted for display in prompts and outputs.
     
     Returns:
         Human-readable date string in format like 'Mon Jan 15, 2024'
     """
+    global _today_str_cache
+    expires_at, today = _today_str_cache
+    if time.time() < expires_at:
+        return today
+
     now = datetime.now()
-    return f"{now:%a} {now:%b} {now.day}, {now:%Y}"
+    today = f"{now:%a} {now:%b} {now.day}, {now:%Y}"
+    next_midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    _today_str_cache = (next_midnight.timestamp(), today)
+    return today
 
 def get_config_value(value):
     """Extract value from configuration, handling enums and None values."""
@@ -1575,37 +1919,48 @@ def get_config_value(value):
     else:
         return value.value
 
+# Model name prefix (before the first ':') -> API key variable name
+_PROVIDER_API_KEY_NAMES = {
+    "openai": "OPENAI_API_KEY",
+    "anthropic": "ANTHROPIC_API_KEY",
+}
+
+@functools.lru_cache(maxsize=1)
+def _api_keys_from_config() -> bool:
+    """Read GET_API_KEYS_FROM_CONFIG once, on first use so .env files loaded after import apply."""
+    return os.getenv("GET_API_KEYS_FROM_CONFIG", "false").lower() == "true"
+
+@functools.lru_cache(maxsize=128)
+def _api_key_name_for_model(model_name: str) -> Optional[str]:
+    """Map a model name to the API key variable its provider uses."""
+    model_name = model_name.lower()
+    prefix, separator, _ = model_name.partition(":")
+    if separator and prefix in _PROVIDER_API_KEY_NAMES:
+        return _PROVIDER_API_KEY_NAMES[prefix]
+    # Google models match on the bare prefix (google:, google_genai:, ...)
+    if model_name.startswith("google"):
+        return "GOOGLE_API_KEY"
+    return None
+
 def get_api_key_for_model(model_name: str, config: RunnableConfig):
     """Get API key for a specific model from environment or config."""
-    should_get_from_config = os.getenv("GET_API_KEYS_FROM_CONFIG", "false")
-    model_name = model_name.lower()
-    if should_get_from_config.lower() == "true":
+    key_name = _api_key_name_for_model(model_name)
+    if _api_keys_from_config():
         api_keys = config.get("configurable", {}).get("apiKeys", {})
-        if not api_keys:
+        if not api_keys or key_name is None:
             return None
-        if model_name.startswith("openai:"):
-            return api_keys.get("OPENAI_API_KEY")
-        elif model_name.startswith("anthropic:"):
-            return api_keys.get("ANTHROPIC_API_KEY")
-        elif model_name.startswith("google"):
-            return api_keys.get("GOOGLE_API_KEY")
-        return None
+        return api_keys.get(key_name)
     else:
-        if model_name.startswith("openai:"): 
-            return os.getenv("OPENAI_API_KEY")
-        elif model_name.startswith("anthropic:"):
-            return os.getenv("ANTHROPIC_API_KEY")
-        elif model_name.startswith("google"):
-            return os.getenv("GOOGLE_API_KEY")
-        return None
+        if key_name is None:
+            return None
+        return os.environ.get(key_name)
 
 def get_tavily_api_key(config: RunnableConfig):
     """Get Tavily API key from environment or config."""
-    should_get_from_config = os.getenv("GET_API_KEYS_FROM_CONFIG", "false")
-    if should_get_from_config.lower() == "true":
+    if _api_keys_from_config():
         api_keys = config.get("configurable", {}).get("apiKeys", {})
         if not api_keys:
             return None
         return api_keys.get("TAVILY_API_KEY")
     else:
-        return os.getenv("TAVILY_API_KEY")
+        return os.environ.get("TAVILY_API_KEY")
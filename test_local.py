@@ -1,95 +1,481 @@
 """Test the local Open Deep Research setup."""
 import asyncio
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from collections import defaultdict
+
+import aiohttp
 from open_deep_research.deep_researcher import deep_researcher
+from langchain_community.cache import SQLiteCache
+from langchain_core.globals import set_llm_cache
 from langchain_core.messages import HumanMessage
 
-async def test_research():
-    """Run a simple test research query."""
+try:
+    import orjson
+    _dumps = orjson.dumps
+
+    def _dumps_sorted(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+except ImportError:
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode()
+
+    # Same bytes as orjson for plain configs, so cache keys match either way
+    def _dumps_sorted(obj) -> bytes:
+        return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode()
+
+# Re-runs of this test replay identical Ollama calls from a local SQLite cache
+# instead of regenerating them. Set ODR_LLM_CACHE="" to disable.
+LLM_CACHE_PATH = os.environ.get("ODR_LLM_CACHE", ".langchain_llm_cache.db")
+
+# llama3.2:latest is already the 4-bit Q4_K_M build of the 3B model (same
+# weights as llama3.2:3b-instruct-q4_K_M). Override with ODR_MODEL to A/B other
+# tags, e.g. llama3.2:3b-instruct-q8_0.
+MODEL_TAG = os.environ.get("ODR_MODEL", "llama3.2:latest")
+
+# Summarization and compression make most of the calls; pointing them at a
+# smaller model (e.g. ODR_FAST_MODEL=qwen2.5:1.5b-instruct-q4_K_M) speeds them
+# up. Run the server with OLLAMA_MAX_LOADED_MODELS=2 so both stay resident.
+FAST_MODEL_TAG = os.environ.get("ODR_FAST_MODEL", MODEL_TAG)
+
+# Ollama server used to preload the models before the run
+OLLAMA_URL = os.environ.get("ODR_OLLAMA_URL", "http://localhost:11434")
+
+# Warm-up timeouts: loading weights can take a while, a healthy SearXNG answers at once
+MODEL_LOAD_TIMEOUT = aiohttp.ClientTimeout(total=120.0)
+SEARXNG_CHECK_TIMEOUT = aiohttp.ClientTimeout(total=2.0)
+
+# Progress lines are batched and flushed at this interval (seconds)
+LOG_FLUSH_INTERVAL = 0.05
+
+# Set ODR_EVENT_LOG to a path to append one JSON line per node event there
+# instead of printing progress. Lines are buffered and written in batches.
+EVENT_LOG_PATH = os.environ.get("ODR_EVENT_LOG", "")
+EVENT_LOG_BATCH = 64
+
+# Reports are also indexed by a hash of (query, config); a matching report is
+# reused instead of re-running the research. Set ODR_FORCE=1 to always re-run.
+OUTPUT_DIR = "research_output"
+REPORT_CACHE_DIR = os.path.join(OUTPUT_DIR, "by_hash")
+FORCE_RERUN = os.environ.get("ODR_FORCE", "0") not in ("", "0")
+
+# Settings that shape how a batch runs rather than what a query produces; they
+# stay out of the key so a query hits its cache however many others run with it
+UNHASHED_CONFIG_KEYS = frozenset({"max_concurrent_research_units", "http_session"})
+
+# Optionally pin this process to a few cores (Linux only) so the event loop does
+# not share caches with local inference. ODR_CPU_AFFINITY takes a taskset-style
+# list such as "0,1" or "0-1". Start Ollama on the remaining cores to match,
+# e.g. `taskset -c 2-7 ollama serve`.
+CPU_AFFINITY = os.environ.get("ODR_CPU_AFFINITY", "")
+
+# Create output directories once at import rather than per saved report
+os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+
+
+def parse_cpu_list(spec: str) -> set[int]:
+    """Parse a CPU list like "0,2" or "0-3,6" into a set of CPU numbers."""
+    cpus = set()
+    for part in spec.split(","):
+        first, _, last = part.strip().partition("-")
+        cpus.update(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+async def drain_log(log_q: asyncio.Queue) -> None:
+    """Write queued progress lines to stdout in batches off the streaming loop."""
+    while True:
+        batch = [await log_q.get()]
+        await asyncio.sleep(LOG_FLUSH_INTERVAL)
+        while not log_q.empty():
+            batch.append(log_q.get_nowait())
+        try:
+            sys.stdout.write("".join(batch))
+            sys.stdout.flush()
+        finally:
+            # Mark the batch done even if the write failed, so join() can't hang on it
+            for _ in batch:
+                log_q.task_done()
+
+
+async def wait_for_log(log_q: asyncio.Queue, writer: asyncio.Task) -> BaseException | None:
+    """Wait until queued lines are written or the writer task stops.
+
+    Returns:
+        The writer's exception if it stopped with lines still queued, else None
+    """
+    join = asyncio.ensure_future(log_q.join())
+    await asyncio.wait({join, writer}, return_when=asyncio.FIRST_COMPLETED)
+    if join.done():
+        return None
+    join.cancel()
+    return writer.exception()
+
+
+DEFAULT_QUERY = "What are the latest advances in quantum computing?"
+
+
+async def drive_research(
+    query: str,
+    config: dict,
+    log_q: asyncio.Queue,
+    label: str = "",
+    event_fd: int | None = None,
+    node_times: dict[str, int] | None = None,
+) -> dict | None:
+    """Stream one research query through the graph and return its final state.
+
+    Progress goes to log_q as text, or to event_fd as JSONL when it is given.
+    The time since the previous event is added to node_times for each node
+    in an event, in nanoseconds.
+    """
+    inputs = {"messages": [HumanMessage(content=query)]}
+    if node_times is None:
+        node_times = defaultdict(int)
+
+    if event_fd is not None:
+        return await _drive_research_jsonl(inputs, config, event_fd, label.strip(), node_times)
+
+    # Bound once; the loop below runs for every streamed event
+    put_line = log_q.put_nowait
+    clock = time.perf_counter_ns
+
+    def handle(node_name: str, node_output, elapsed: int) -> None:
+        """Record timing and queue progress lines for one node's output."""
+        node_times[node_name] += elapsed
+        put_line(f"{label}[NODE] {node_name}\n")
+        if type(node_output) is dict:
+            for msg in node_output.get("messages") or ():
+                try:
+                    content = msg.content
+                except AttributeError:
+                    continue
+                put_line(f"   {content[:200]}...\n")
+        put_line("\n")
+
+    final_state = None
+    last = clock()
+    async for event in deep_researcher.astream(inputs, config=config):
+        now = clock()
+        elapsed, last = now - last, now
+
+        # Print progress; most events carry a single finished node
+        if len(event) == 1:
+            (node_name, final_state), = event.items()
+            handle(node_name, final_state, elapsed)
+        else:
+            for node_name, final_state in event.items():
+                handle(node_name, final_state, elapsed)
+
+    return final_state
+
+
+async def _drive_research_jsonl(
+    inputs: dict, config: dict, event_fd: int, label: str, node_times: dict[str, int]
+) -> dict | None:
+    """Stream a research run, appending one JSON line per node event to event_fd."""
+    buf = bytearray()
+    pending = 0
+    clock = time.perf_counter_ns
+
+    final_state = None
+    last = clock()
+    try:
+        async for event in deep_researcher.astream(inputs, config=config):
+            now = clock()
+            elapsed, last = now - last, now
+            for node_name, node_output in event.items():
+                node_times[node_name] += elapsed
+                contents = []
+                if type(node_output) is dict:
+                    for msg in node_output.get("messages") or ():
+                        try:
+                            contents.append(msg.content[:200])
+                        except AttributeError:
+                            continue
+                buf += _dumps({"q": label, "n": node_name, "ns": elapsed, "c": contents})
+                buf += b"\n"
+                pending += 1
+                if pending >= EVENT_LOG_BATCH:
+                    os.write(event_fd, buf)
+                    buf.clear()
+                    pending = 0
+
+                # Capture final state
+                final_state = node_output
+    finally:
+        if buf:
+            os.write(event_fd, buf)
+
+    return final_state
+
+
+async def warm_up(session: aiohttp.ClientSession, configurable: dict) -> None:
+    """Load each Ollama model in the config and check SearXNG, all at once.
+
+    Moves the cold model load out of the measured run. Failures are only
+    reported; the run itself surfaces real errors.
+    """
+    models = {
+        configurable[key].removeprefix("ollama:")
+        for key in ("research_model", "summarization_model", "compression_model", "final_report_model")
+        if configurable[key].startswith("ollama:")
+    }
+
+    async def load_model(model: str) -> None:
+        # An empty prompt loads the model without generating; keep_alive holds it for the run
+        payload = {"model": model, "prompt": "", "keep_alive": "30m"}
+        async with session.post(
+            f"{OLLAMA_URL}/api/generate", json=payload, timeout=MODEL_LOAD_TIMEOUT
+        ) as response:
+            response.raise_for_status()
+
+    async def check_searxng() -> None:
+        async with session.get(configurable["searxng_url"], timeout=SEARXNG_CHECK_TIMEOUT) as response:
+            response.raise_for_status()
+
+    targets = [f"model {model}" for model in models] + ["SearXNG"]
+    results = await asyncio.gather(
+        *(load_model(model) for model in models), check_searxng(), return_exceptions=True
+    )
+    for target, result in zip(targets, results):
+        if isinstance(result, Exception):
+            print(f"[WARMUP] {target} not ready: {result}")
+
+
+def print_node_times(node_times: dict[str, int]) -> None:
+    """Print time spent per graph node, slowest first."""
+    if not node_times:
+        return
+    print("\n[TIMING] Time per node (between streamed events):")
+    for node_name, total_ns in sorted(node_times.items(), key=lambda item: -item[1]):
+        print(f"   {node_name:<30} {total_ns / 1e9:10.2f}s")
+
+
+def report_cache_path(query: str, configurable: dict) -> str:
+    """Path of the cached report for a query run with the given configuration."""
+    hashed = {key: value for key, value in configurable.items() if key not in UNHASHED_CONFIG_KEYS}
+    payload = _dumps_sorted({"q": query, "c": hashed})
+    key = hashlib.blake2b(payload, digest_size=16).hexdigest()
+    return os.path.join(REPORT_CACHE_DIR, f"{key}.md")
+
+
+def load_cached_report(cache_path: str) -> dict | None:
+    """Return a final state holding the cached report, or None on a miss."""
+    if FORCE_RERUN or not os.path.exists(cache_path):
+        return None
+    with open(cache_path, encoding="utf-8") as f:
+        return {"final_report": f.read()}
+
+
+def index_report(filename: str, cache_path: str) -> None:
+    """Hard-link a saved report under its cache key, copying if links aren't supported."""
+    if os.path.exists(cache_path):
+        os.remove(cache_path)
+    try:
+        os.link(filename, cache_path)
+    except OSError:
+        shutil.copyfile(filename, cache_path)
+
+
+def save_report(final_state: dict | None, suffix: str = "") -> str | None:
+    """Save the final report from a research run to research_output/.
+
+    Returns:
+        Path of the saved report, or None if there was no report to save
+    """
+    if not (final_state and isinstance(final_state, dict)):
+        return None
+
+    final_report = final_state.get("final_report")
+    if final_report:
+        # Generate a unique, time-ordered filename
+        filename = f"{OUTPUT_DIR}/research_report_{time.time_ns():x}{suffix}.md"
+
+        # Save report, encoded once and written straight to the file descriptor
+        data = memoryview(final_report.encode("utf-8"))
+        fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            # os.write may write less than requested, so loop until done
+            while data:
+                data = data[os.write(fd, data):]
+        finally:
+            os.close(fd)
+
+        return filename
+    return None
+
+
+def persist_report(final_state: dict | None, suffix: str, cache_path: str) -> str:
+    """Save a report and index it for reuse unless it records a generation error.
+
+    Returns:
+        Progress lines describing the outcome, for the caller to queue in order
+    """
+    if not (final_state and isinstance(final_state, dict)):
+        return ""
+    filename = save_report(final_state, suffix)
+    if filename is None:
+        return "\n[WARNING] No final_report found in final state\n"
 
-    # Simple research query
-    query = "What are the latest advances in quantum computing?"
+    final_report = final_state["final_report"]
+    if not final_report.startswith("Error generating final report"):
+        index_report(filename, cache_path)
+    return (
+        f"\n[SAVED] Final report saved to: {filename}\n"
+        f"[SIZE] Report length: {len(final_report)} characters\n"
+    )
 
-    print(f"\n[TEST] Testing Open Deep Research with query:")
-    print(f"   '{query}'")
+
+async def test_research(queries: list[str] | None = None):
+    """Run one or more research queries concurrently.
+
+    Concurrent queries let Ollama batch their sub-agent requests server-side;
+    start the server with OLLAMA_NUM_PARALLEL set (e.g. 8) to allow it.
+
+    Args:
+        queries: Research queries to run; defaults to a single quantum computing query
+
+    Returns:
+        List of final states, one per query, or None if the run failed
+    """
+    queries = queries or [DEFAULT_QUERY]
+
+    print(f"\n[TEST] Testing Open Deep Research with {len(queries)} quer{'y' if len(queries) == 1 else 'ies'}:")
+    for query in queries:
+        print(f"   '{query}'")
     print(f"\n{'='*60}")
 
     # Create config with local settings
     config = {
         "configurable": {
-            "summarization_model": "ollama:llama3.2:latest",
-            "research_model": "ollama:llama3.2:latest",
-            "compression_model": "ollama:llama3.2:latest",
-            "final_report_model": "ollama:llama3.2:latest",
+            "summarization_model": f"ollama:{FAST_MODEL_TAG}",
+            "research_model": f"ollama:{MODEL_TAG}",
+            "compression_model": f"ollama:{FAST_MODEL_TAG}",
+            "final_report_model": f"ollama:{MODEL_TAG}",
             "search_api": "searxng",
             "searxng_url": "http://localhost:8080",
-            "max_concurrent_research_units": 2,
+            # More units in flight give Ollama more requests to batch together
+            "max_concurrent_research_units": min(len(queries) * 4, 16),
             "allow_clarification": False,  # Skip clarification for test
         }
     }
 
-    # Run the research
-    inputs = {"messages": [HumanMessage(content=query)]}
+    # Reuse saved reports for queries already run with this exact configuration
+    cache_paths = {query: report_cache_path(query, config["configurable"]) for query in queries}
+    final_by_query = {}
+    for query, cache_path in cache_paths.items():
+        cached_state = load_cached_report(cache_path)
+        if cached_state is not None:
+            print(f"[CACHE HIT] '{query}' -> {cache_path}")
+            final_by_query[query] = cached_state
+    pending = [query for query in cache_paths if query not in final_by_query]
+    if not pending:
+        return [final_by_query[query] for query in queries]
+
+    # Cache LLM responses by exact prompt and model parameters
+    if LLM_CACHE_PATH:
+        set_llm_cache(SQLiteCache(database_path=LLM_CACHE_PATH))
 
     print("\n[START] Starting research...\n")
 
-    try:
-        final_state = None
-        async for event in deep_researcher.astream(inputs, config=config):
-            # Print progress
-            for node_name, node_output in event.items():
-                print(f"[NODE] {node_name}")
-                if node_output and isinstance(node_output, dict) and "messages" in node_output:
-                    for msg in node_output["messages"]:
-                        if hasattr(msg, "content"):
-                            print(f"   {msg.content[:200]}...")
-                print()
+    # One keep-alive pool for every SearXNG request in the run, picked up by the search tool
+    http_session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=100,
+            limit_per_host=32,
+            keepalive_timeout=60,
+            enable_cleanup_closed=True,
+        )
+    )
+    config["configurable"]["http_session"] = http_session
+    await warm_up(http_session, config["configurable"])
 
-                # Capture final state
-                final_state = node_output
+    # Progress output goes through a queue so stdout writes don't stall the stream
+    log_q: asyncio.Queue = asyncio.Queue()
+    writer = asyncio.create_task(drain_log(log_q))
+    node_times: dict[str, int] = defaultdict(int)
+    event_fd = None
+    if EVENT_LOG_PATH:
+        event_fd = os.open(EVENT_LOG_PATH, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        print(f"[EVENTS] Logging node events to {EVENT_LOG_PATH}")
 
-        print(f"\n{'='*60}")
-        print("[SUCCESS] Research completed successfully!")
-
-        # Save final report to file
-        if final_state and isinstance(final_state, dict):
-            final_report = final_state.get("final_report")
-            if final_report:
-                # Create output directory if it doesn't exist
-                import os
-                output_dir = "research_output"
-                os.makedirs(output_dir, exist_ok=True)
+    tasks: list[asyncio.Task] = []
+    try:
+        multiple = len(pending) > 1
 
-                # Generate filename with timestamp
-                from datetime import datetime
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"{output_dir}/research_report_{timestamp}.md"
+        async def run_and_save(i: int, query: str) -> None:
+            """Research one query, then save its report off the event loop."""
+            final_state = await drive_research(
+                query, config, log_q, f"[Q{i + 1}] " if multiple else "", event_fd, node_times
+            )
+            final_by_query[query] = final_state
+            # The write overlaps with queries that are still running; its messages
+            # are queued after this query's progress lines rather than printed
+            # from the worker thread
+            saved_lines = await asyncio.to_thread(
+                persist_report, final_state, f"_{i + 1}" if multiple else "", cache_paths[query]
+            )
+            if saved_lines:
+                log_q.put_nowait(saved_lines)
 
-                # Save report
-                with open(filename, "w", encoding="utf-8") as f:
-                    f.write(final_report)
+        # Run the research, all uncached queries at once
+        tasks = [asyncio.create_task(run_and_save(i, query)) for i, query in enumerate(pending)]
+        await asyncio.gather(*tasks)
 
-                print(f"\n[SAVED] Final report saved to: {filename}")
-                print(f"[SIZE] Report length: {len(final_report)} characters")
-            else:
-                print("\n[WARNING] No final_report found in final state")
+        log_error = await wait_for_log(log_q, writer)
+        if log_error is not None:
+            raise log_error
+        print(f"\n{'='*60}")
+        print("[SUCCESS] Research completed successfully!")
 
-        return final_state
+        return [final_by_query[query] for query in queries]
 
     except Exception as e:
+        await wait_for_log(log_q, writer)
         print(f"\n[ERROR] {e}")
         import traceback
         traceback.print_exc()
         return None
 
+    finally:
+        # If one query failed, stop the others before closing what they write to
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        writer.cancel()
+        print_node_times(node_times)
+        if event_fd is not None:
+            os.close(event_fd)
+        await http_session.close()
+
 if __name__ == "__main__":
+    # Replace characters the console can't encode (e.g. cp1252 pipes) rather than fail
+    sys.stdout.reconfigure(errors="replace")
+
     print("\n" + "="*60)
     print("TESTING LOCAL OPEN DEEP RESEARCH")
     print("="*60)
     print("\nConfiguration:")
-    print("   - LLM: Ollama (llama3.2:latest)")
+    print(f"   - LLM: Ollama ({MODEL_TAG}, summarization/compression: {FAST_MODEL_TAG})")
     print("   - Search: SearXNG (localhost:8080)")
     print("   - Database: PostgreSQL (localhost:5432)")
     print()
 
-    # Run the test
-    asyncio.run(test_research())
+    if CPU_AFFINITY and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, parse_cpu_list(CPU_AFFINITY))
+
+    # Run the test; pass queries as arguments to research several at once
+    main = test_research(sys.argv[1:] or None)
+
+    # uvloop is optional; it lowers per-await overhead on the HTTP-heavy run
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main)
+    else:
+        uvloop.run(main)
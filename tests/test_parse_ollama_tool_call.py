@@ -0,0 +1,50 @@
+import pytest
+
+from open_deep_research.utils import parse_ollama_tool_call
+
+
+@pytest.mark.parametrize(
+    "response_text, expected",
+    [
+        ("Thought: done\nFinal Answer: 42", ("final_answer", "42")),
+        ("**Final Answer:** done", ("final_answer", "done")),
+        ("**Final Answer**: done", ("final_answer", "done")),
+        ("Thought: ok. Final Answer: done", ("final_answer", "done")),
+        ("FINAL ANSWER: done", ("final_answer", "done")),
+    ],
+)
+def test_final_answer_markers(response_text, expected):
+    assert parse_ollama_tool_call(response_text) == expected
+
+
+@pytest.mark.parametrize(
+    "response_text",
+    [
+        'Thought: reflect\nAction: think_tool\nAction Input: {"reflection": "x"}',
+        '**Action:** think_tool\n**Action Input:** {"reflection": "x"}',
+        'Thought: reflect. Action: think_tool\nAction Input: {"reflection": "x"}',
+        'ACTION: think_tool\nACTION INPUT: {"reflection": "x"}',
+    ],
+)
+def test_action_markers(response_text):
+    assert parse_ollama_tool_call(response_text) == (
+        "tool_call",
+        {"tool": "think_tool", "input": {"reflection": "x"}},
+    )
+
+
+def test_inline_action_without_input():
+    action_type, action_data = parse_ollama_tool_call("Thought: search. Action: searxng_search")
+    assert action_type == "tool_call"
+    assert action_data["tool"] == "searxng_search"
+
+
+def test_lowercase_prose_is_not_a_final_answer():
+    response_text = 'Thought: the final answer: is near\nAction: think_tool\nAction Input: {"reflection": "x"}'
+    action_type, action_data = parse_ollama_tool_call(response_text)
+    assert action_type == "tool_call"
+    assert action_data["tool"] == "think_tool"
+
+
+def test_marker_inside_a_word_is_ignored():
+    assert parse_ollama_tool_call("Transaction: foo") == ("none", None)